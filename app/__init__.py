@@ -2,24 +2,52 @@ from sqlite3 import Connection as SQLite3Connection
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from sqlalchemy.engine import Engine
+from app.utils.page_cache import PageCache
+from app.utils.user_cache import UserCache
+from app.utils.replicas import ReplicaRouter, RoutingSession
+from app.utils.shards import ShardMovedError, ShardRouter
+from app.utils.jobs import JobExecutor
+from app.utils.metrics import Metrics
+from app.utils.sql_debug import SQLDebugger
+from app.utils.profiler import RequestProfiler
 from flask_migrate import Migrate
 from dotenv import load_dotenv
 from sqlalchemy import event
-from flask import Flask
+from flask import Flask, jsonify, request
 import cloudinary
 import os
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
+page_cache = PageCache()
+user_cache = UserCache()
+jobs = JobExecutor()
+metrics = Metrics()
+sql_debugger = SQLDebugger()
+profiler = RequestProfiler()
+replicas = ReplicaRouter()
+shards = ShardRouter()
 load_dotenv()
 
 
+# WAL lets readers and a writer work at the same time, the busy timeout makes
+# writers queue for the lock instead of failing with "database is locked"
+SQLITE_PRAGMAS = (
+    "PRAGMA foreign_keys=ON;",
+    "PRAGMA journal_mode=WAL;",
+    "PRAGMA synchronous=NORMAL;",
+    f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))};",
+    f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))};",
+)
+
+
 @event.listens_for(Engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
     if isinstance(dbapi_connection, SQLite3Connection):
         cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA foreign_keys=ON;")
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
         cursor.close()
 
 
@@ -29,18 +57,94 @@ cloudinary.config(
     api_secret=os.getenv("CLOUDINARY_API_SECRET"),
 )
 
+def engine_options(database_url):
+    """Connection pool settings for the configured database, tunable from the env"""
+    options = {
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+    }
+    # SQLite's pools are per-file and do not take size/overflow settings
+    if not (database_url or "").startswith("sqlite"):
+        options["pool_size"] = int(os.getenv("DB_POOL_SIZE", 10))
+        options["max_overflow"] = int(os.getenv("DB_MAX_OVERFLOW", 20))
+        options["pool_timeout"] = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    return options
+
+
 class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key")
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # Read replicas for @use_replica views, e.g. "postgresql://replica1/db,postgresql://replica2/db"
+    SQLALCHEMY_REPLICA_URLS = [
+        url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+    ]
+    REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 5))  # primary-only after a write
+    REPLICA_RETRY_AFTER = int(os.getenv("REPLICA_RETRY_AFTER", 30))  # skip a failed replica this long
+
+    # Shards 1..N for per-user rows, shard 0 being DATABASE_URL which also holds the user directory
+    SQLALCHEMY_SHARD_URLS = [
+        url.strip() for url in os.getenv("DATABASE_SHARD_URLS", "").split(",") if url.strip()
+    ]
+
+    # Rendered page cache: "lru", "null" or a dotted path to a backend class
+    PAGE_CACHE_BACKEND = os.getenv("PAGE_CACHE_BACKEND", "lru")
+    PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+    PAGE_CACHE_SALT = os.getenv("PAGE_CACHE_SALT", "")  # change on deploy to drop old ETags
+
+    # user_loader cache: "memory" or a dotted path to a shared backend class
+    USER_CACHE_BACKEND = os.getenv("USER_CACHE_BACKEND", "memory")
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 60))
 
-def create_app():
+    # Background jobs: "thread", "process", "sync" or a dotted path to a runner
+    JOB_EXECUTOR = os.getenv("JOB_EXECUTOR", "thread")
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+    JOB_MAX_RETRIES = int(os.getenv("JOB_MAX_RETRIES", 3))
+    ACCOUNT_PURGE_BATCH_SIZE = int(os.getenv("ACCOUNT_PURGE_BATCH_SIZE", 1000))  # rows per delete
+    ACCOUNT_PURGE_PAUSE = float(os.getenv("ACCOUNT_PURGE_PAUSE", 0.05))  # seconds between deletes
+
+    # `flask archive run` moves expenses/incomes older than this to the archive tables
+    ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", 365))
+    AVATAR_STORAGE = os.getenv("AVATAR_STORAGE", "cloudinary")  # "local" or "fake"
+    AVATAR_LOCAL_DIR = os.getenv("AVATAR_LOCAL_DIR")  # defaults to instance/avatars
+    AVATAR_FORMAT = os.getenv("AVATAR_FORMAT", "webp")  # or "jpeg"
+
+    # Prometheus /metrics, set PROMETHEUS_MULTIPROC_DIR when running several workers
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # "Authorization: Bearer <token>", unset is a 404
+
+    # Slow query / N+1 detector, for development and staging only
+    SQL_DEBUG = os.getenv("SQL_DEBUG", "false").lower() == "true"
+    SQL_DEBUG_PANEL = os.getenv("SQL_DEBUG_PANEL", "false").lower() == "true"
+    SQL_DEBUG_SLOW_MS = float(os.getenv("SQL_DEBUG_SLOW_MS", 100))
+    SQL_DEBUG_REPEAT = int(os.getenv("SQL_DEBUG_REPEAT", 5))
+
+    # Per-request cProfile dumps, triggered by token or sampled
+    PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+    PROFILER_TOKEN = os.getenv("PROFILER_TOKEN")  # X-Profile header or ?_profile=
+    PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", 0))
+    PROFILER_DIR = os.getenv("PROFILER_DIR")  # defaults to instance/profiles
+    PROFILER_MAX_FILES = int(os.getenv("PROFILER_MAX_FILES", 200))
+
+def create_app(config=None):
     app = Flask(__name__)
     app.config.from_object(Config)
+    if config:
+        app.config.update(config)
 
+    metrics.init_app(app)  # before the db, it swaps in a timed connection pool
+    replicas.init_app(app, db)  # before the db, it adds a bind per replica
+    shards.init_app(app, db)  # and per shard
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
+    page_cache.init_app(app)
+    user_cache.init_app(app)
+    jobs.init_app(app)
+    sql_debugger.init_app(app)
+    profiler.init_app(app)
     login_manager.login_view = "auth.login"
     login_manager.login_message_category = "info"
 
@@ -49,14 +153,42 @@ def create_app():
     from app.routes.home import home_bp
     from app.routes.settings import settings_bp
     from app.routes.dashboard import dashboard_bp
+    from app.routes.api import api_bp
+    from app.utils.pagination import page_url
+    from app.commands import register_commands
+    from app.utils.avatar_storage import create_storage
 
     @login_manager.user_loader
     def load_user(user_id):
-        return Signup.query.get(int(user_id))
+        user = user_cache.load(db.session, Signup, int(user_id))
+        if user is None or user.deleted_at is not None:
+            return None
+        # Not from the cache: a move in another process only invalidates its own copy
+        shards.use_user(user.id)
+        return user
+
+    @app.errorhandler(ShardMovedError)
+    def shard_moved(error):
+        # Nothing was committed, the retry is routed to the user's new shard
+        db.session.rollback()
+        message = "Your data was just moved, please try again."
+        if request.blueprint == "api":
+            response = jsonify(error=message)
+        else:
+            response = app.make_response(message)
+        response.status_code = 503
+        response.headers["Retry-After"] = "1"
+        return response
+
+    app.add_template_global(page_url)
+    app.extensions["avatar_storage"] = create_storage(app)
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(home_bp)
     app.register_blueprint(settings_bp)
     app.register_blueprint(dashboard_bp)
+    app.register_blueprint(api_bp)
+
+    register_commands(app)
 
     return app
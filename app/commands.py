@@ -0,0 +1,403 @@
+from app.models import (
+    Category,
+    Expense,
+    ExpenseArchive,
+    Income,
+    IncomeArchive,
+    LedgerEntry,
+    MonthlyRollup,
+    Signup,
+    Tombstone,
+    UserBalance,
+)
+from sqlalchemy import func, select, tuple_
+from app.utils.ledger_utils import compute_balance, rebuild_ledger, rebuild_rollups
+from app.utils.account_utils import pending_purges, purge_account, remaining_rows
+from app.utils.archive_utils import ARCHIVES, archive_cutoff, archive_user, duplicate_ids
+from app.utils.shards import ShardMovedError
+from app.utils.seed_utils import SEED_PASSWORD, seed_data
+from app.utils.filter_utils import apply_filters
+from datetime import date, datetime
+from flask import current_app
+from app import db, shards
+import click
+import sys
+
+
+def hot_queries(user_id=1):
+    """The per-user reads behind the dashboard, history, transactions, analytics
+    and sync pages, as (name, statement, ordered).
+
+    `ordered` statements are LIMITed pages: their index has to deliver the
+    ORDER BY too, or every page sorts all of the user's rows.
+    """
+    cursor = (datetime(2025, 1, 1), 1)
+    queries = []
+    for model in (Expense, Income, ExpenseArchive, IncomeArchive, LedgerEntry):
+        table = model.__tablename__
+        key = tuple_(model.date, model.id)
+        rows = select(model).where(model.user_id == user_id)
+        queries.append(
+            (
+                f"{table} page",
+                rows.where(key < tuple_(*cursor))
+                .order_by(model.date.desc(), model.id.desc())
+                .limit(26),
+                True,
+            )
+        )
+        queries.append(
+            (
+                f"{table} newer page",
+                rows.where(key > tuple_(*cursor))
+                .order_by(model.date.asc(), model.id.asc())
+                .limit(26),
+                True,
+            )
+        )
+
+    for model in (Expense, Income):
+        table = model.__tablename__
+        filters = {"from": datetime(2025, 1, 1), "to": datetime(2025, 1, 31), "min_amount": 100}
+        if model is Expense:
+            filters["category"] = 1
+        queries.append(
+            (
+                f"{table} filtered page",
+                apply_filters(select(model).where(model.user_id == user_id), model, filters)
+                .order_by(model.date.desc(), model.id.desc())
+                .limit(26),
+                False,
+            )
+        )
+
+    for model in (Expense, Income, ExpenseArchive, IncomeArchive):
+        table = model.__tablename__
+        queries.append(
+            (
+                f"{table} sync page",
+                select(model)
+                .where(
+                    model.user_id == user_id,
+                    model.change_seq > 10,
+                    model.change_seq <= 20,
+                    tuple_(model.change_seq, model.id) > tuple_(12, 1),
+                )
+                .order_by(model.change_seq, model.id)
+                .limit(1001),
+                True,
+            )
+        )
+
+    queries += [
+        (
+            "tombstone sync",
+            select(Tombstone.kind, Tombstone.row_id)
+            .where(Tombstone.user_id == user_id, Tombstone.change_seq > 10, Tombstone.change_seq <= 20)
+            .order_by(Tombstone.change_seq),
+            False,
+        ),
+        (
+            "ledger_entry balance after",
+            select(func.coalesce(func.sum(LedgerEntry.amount), 0)).where(
+                LedgerEntry.user_id == user_id,
+                tuple_(LedgerEntry.date, LedgerEntry.id) > tuple_(*cursor),
+            ),
+            False,
+        ),
+        (
+            "monthly_rollup report",
+            select(MonthlyRollup.kind, MonthlyRollup.month, Category.name, MonthlyRollup.total)
+            .outerjoin(Category, Category.id == MonthlyRollup.category_id)
+            .where(
+                MonthlyRollup.user_id == user_id,
+                MonthlyRollup.month >= date(2024, 1, 1),
+                MonthlyRollup.count > 0,
+            )
+            .order_by(MonthlyRollup.month),
+            False,
+        ),
+    ]
+    return queries
+
+
+def explain(statement):
+    """Run the dialect's EXPLAIN for `statement` and return the plan as text lines"""
+    dialect = db.engine.dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+
+    with db.engine.connect() as connection:
+        if dialect.name == "sqlite":
+            rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+            return [row[-1] for row in rows]
+        if dialect.name == "postgresql":
+            # Small test tables would otherwise always win with a seq scan
+            connection.exec_driver_sql("SET enable_seqscan = off")
+            rows = connection.exec_driver_sql(f"EXPLAIN {sql}").fetchall()
+            return [row[0] for row in rows]
+    raise click.ClickException(f"EXPLAIN is not supported for {dialect.name}")
+
+
+def plan_problems(plan, dialect_name, ordered):
+    """Plan lines reading a table without an index, or sorting an `ordered` page"""
+    problems = []
+    for line in plan:
+        if dialect_name == "sqlite":
+            scans = line.startswith("SCAN") and "INDEX" not in line and "CONSTANT ROW" not in line
+            sorts = "USE TEMP B-TREE FOR" in line and "ORDER BY" in line
+        else:
+            scans = "Seq Scan" in line
+            sorts = line.lstrip(" ->").startswith(("Sort", "Incremental Sort"))
+        if scans or (ordered and sorts):
+            problems.append(line)
+    return problems
+
+
+@click.command("check-query-plans")
+def check_query_plans():
+    """Fail if any hot page query stops using an index for its filter or order."""
+    dialect_name = db.engine.dialect.name
+    failed = False
+
+    for name, statement, ordered in hot_queries():
+        plan = explain(statement)
+        ok = not plan_problems(plan, dialect_name, ordered)
+        failed = failed or not ok
+        click.echo(f"[{'ok' if ok else 'FAIL'}] {name}")
+        for line in plan:
+            click.echo(f"    {line}")
+
+    if failed:
+        sys.exit(1)
+
+
+@click.group("balances")
+def balances():
+    """Maintain the per-user balance summaries."""
+
+
+def _balance_user_ids(user_id):
+    if user_id is not None:
+        return [user_id]
+    return db.session.scalars(select(Signup.id).order_by(Signup.id)).all()
+
+
+def _balance_values(balance):
+    return (
+        balance.total_income,
+        balance.total_expense,
+        balance.income_count,
+        balance.expense_count,
+    )
+
+
+@balances.command("rebuild")
+@click.option("--user-id", type=int, help="Only rebuild this user.")
+def rebuild_balances(user_id):
+    """Recompute summaries from the raw income/expense rows."""
+    user_ids = _balance_user_ids(user_id)
+    for uid in user_ids:
+        shards.use_user(uid)
+        db.session.merge(compute_balance(uid))
+    db.session.commit()
+    click.echo(f"Rebuilt {len(user_ids)} balance summaries.")
+
+
+@balances.command("verify")
+@click.option("--user-id", type=int, help="Only verify this user.")
+def verify_balances(user_id):
+    """Compare stored summaries with the raw rows, exit 1 on drift."""
+    drifted = 0
+    for uid in _balance_user_ids(user_id):
+        shards.use_user(uid)
+        stored = db.session.get(UserBalance, uid)
+        expected = compute_balance(uid)
+        if stored is None or _balance_values(stored) != _balance_values(expected):
+            drifted += 1
+            click.echo(
+                f"user {uid}: stored {_balance_values(stored) if stored else None}"
+                f" != expected {_balance_values(expected)}"
+            )
+
+    if drifted:
+        click.echo(f"{drifted} balance summaries out of date.")
+        sys.exit(1)
+    click.echo("All balance summaries match.")
+
+
+def _each_shard(user_id):
+    """Point the session at the user's shard, or at every shard in turn"""
+    if user_id is not None:
+        yield shards.use_user(user_id)
+        return
+    for shard in range(shards.count):
+        shards.use(shard)
+        yield shard
+
+
+@click.group("rollups")
+def rollups():
+    """Maintain the monthly/category rollups."""
+
+
+@rollups.command("rebuild")
+@click.option("--user-id", type=int, help="Only rebuild this user.")
+def rebuild_rollups_command(user_id):
+    """Recompute rollups from the raw income/expense rows."""
+    for _ in _each_shard(user_id):
+        rebuild_rollups(user_id)
+    db.session.commit()
+    click.echo("Rollups rebuilt.")
+
+
+@click.group("ledger")
+def ledger():
+    """Maintain the combined transaction ledger."""
+
+
+@ledger.command("rebuild")
+@click.option("--user-id", type=int, help="Only rebuild this user.")
+def rebuild_ledger_command(user_id):
+    """Recopy ledger entries from the raw income/expense rows."""
+    for _ in _each_shard(user_id):
+        rebuild_ledger(user_id)
+    db.session.commit()
+    click.echo("Ledger rebuilt.")
+
+
+@click.group("shards")
+def shards_group():
+    """Place users' ledger rows across the shard databases."""
+
+
+@shards_group.command("init")
+def init_shards():
+    """Create the tables on shards 1..N (shard 0 is migrated as usual)."""
+    for shard in range(1, shards.count):
+        db.metadata.create_all(shards.engine(shard))
+        click.echo(f"Shard {shard}: tables created.")
+
+
+@shards_group.command("status")
+def shard_status():
+    """Show how many users each shard holds."""
+    counts = shards.user_counts()
+    for shard in range(shards.count):
+        click.echo(f"Shard {shard}: {counts.get(shard, 0)} users")
+
+
+@shards_group.command("move")
+@click.argument("user_id", type=int)
+@click.argument("target", type=int)
+@click.option("--batch-size", default=1000, show_default=True, help="Rows per copy/delete.")
+@click.option("--grace", default=5.0, show_default=True, help="Seconds to let in-flight requests finish.")
+@click.option("--retries", default=3, show_default=True, help="Copies to attempt while the user writes.")
+def move_user(user_id, target, batch_size, grace, retries):
+    """Move one user's rows to the TARGET shard while they stay online."""
+    try:
+        moved = shards.move_user(
+            user_id, target, batch_size=batch_size, grace=grace, retries=retries, echo=click.echo
+        )
+    except (ValueError, RuntimeError) as e:
+        raise click.ClickException(str(e))
+    click.echo(f"User {user_id} is on shard {target}." if moved else "Nothing to move.")
+
+
+@click.group("archive")
+def archive():
+    """Move old expenses and incomes out of the live tables."""
+
+
+@archive.command("run")
+@click.option("--older-than-days", type=int, help="Defaults to ARCHIVE_AFTER_DAYS.")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows moved per transaction.")
+@click.option("--pause", default=0.05, show_default=True, help="Seconds to sleep between batches.")
+@click.option("--user-id", type=int, help="Only archive this user's rows.")
+def run_archive(older_than_days, batch_size, pause, user_id):
+    """Archive rows dated before the cutoff, user by user on every shard."""
+    days = older_than_days or current_app.config.get("ARCHIVE_AFTER_DAYS", 365)
+    cutoff = archive_cutoff(days)
+    click.echo(f"Archiving rows dated before {cutoff:%Y-%m-%d}.")
+    for shard in _each_shard(user_id):
+        user_ids = [user_id] if user_id is not None else db.session.scalars(
+            select(Signup.id).where(Signup.shard == shard, Signup.deleted_at.is_(None))
+        ).all()
+        moved = 0
+        for uid in user_ids:
+            try:
+                moved += archive_user(uid, cutoff, batch_size, pause)
+            except ShardMovedError:
+                db.session.rollback()
+                click.echo(f"user {uid} moved shards meanwhile, archive them again later")
+        click.echo(f"Shard {shard}: {moved} rows archived for {len(user_ids)} users.")
+
+
+@archive.command("status")
+def archive_status():
+    """Count live and archived rows on every shard, failing if an id is in both."""
+    duplicates = 0
+    for shard in _each_shard(None):
+        counts = [
+            f"{kind} {db.session.scalar(select(func.count()).select_from(live))} live,"
+            f" {db.session.scalar(select(func.count()).select_from(archived))} archived"
+            for kind, (live, archived) in ARCHIVES.items()
+        ]
+        click.echo(f"Shard {shard}: {'; '.join(counts)}")
+        for kind in ARCHIVES:
+            ids = duplicate_ids(kind)
+            if ids:
+                duplicates += len(ids)
+                click.echo(f"  {kind} ids both live and archived: {ids[:20]}")
+    if duplicates:
+        raise click.ClickException(f"{duplicates} ids are both live and archived.")
+
+
+@click.group("accounts")
+def accounts():
+    """Follow and finish the purges of closed accounts."""
+
+
+@accounts.command("pending")
+def pending_accounts():
+    """List closed accounts and the rows they still have."""
+    users = pending_purges()
+    for user in users:
+        remaining = {name: count for name, count in remaining_rows(user).items() if count}
+        click.echo(
+            f"user {user.id} (closed {user.deleted_at:%Y-%m-%d %H:%M}, shard {user.shard}):"
+            f" {sum(remaining.values())} rows left {remaining or ''}"
+        )
+    click.echo(f"{len(users)} accounts pending purge.")
+
+
+@accounts.command("purge")
+@click.option("--user-id", type=int, help="Only purge this account.")
+def purge_accounts(user_id):
+    """Purge closed accounts now, e.g. after a worker died mid-purge."""
+    user_ids = [user_id] if user_id is not None else [user.id for user in pending_purges()]
+    for uid in user_ids:
+        click.echo(f"user {uid}: {purge_account(uid)} rows deleted")
+
+
+@click.command("seed")
+@click.option("--users", default=10, show_default=True, help="Accounts to create.")
+@click.option("--rows", default=1000, show_default=True, help="Expenses and incomes per account.")
+@click.option("--seed", default=42, show_default=True, help="Random seed.")
+def seed(users, rows, seed):
+    """Bulk-generate synthetic users with expenses and incomes."""
+    user_ids = seed_data(users, rows, seed=seed)
+    click.echo(
+        f"Created {len(user_ids)} users with {rows} expenses and {rows} incomes each"
+        f" (password: {SEED_PASSWORD})."
+    )
+
+
+def register_commands(app):
+    app.cli.add_command(check_query_plans)
+    app.cli.add_command(balances)
+    app.cli.add_command(rollups)
+    app.cli.add_command(ledger)
+    app.cli.add_command(shards_group)
+    app.cli.add_command(accounts)
+    app.cli.add_command(archive)
+    app.cli.add_command(seed)
@@ -10,31 +10,174 @@ class Signup(db.Model, UserMixin):
     password = db.Column(db.String(300), nullable=False)
     country = db.Column(db.String(100), nullable=False)
     profile_picture_url = db.Column(db.String(500))  # stores only url for pfp
+    avatar_status = db.Column(db.String(20))  # uploading / ready / failed
     timezone = db.Column(db.String(100), default="Asia/Karachi", nullable=False)
+    data_version = db.Column(db.Integer, default=0, nullable=False)  # bumped on every write
+    shard = db.Column(db.Integer, default=0, nullable=False, index=True)  # database of the user's rows
+    deleted_at = db.Column(db.DateTime)  # account closed, rows being purged
 
     expenses = db.relationship(
         "Expense", backref="user", cascade="all, delete", passive_deletes=True
     )
 
 
+class Category(db.Model):
+    # A user's expense category, stored once and referenced by id
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "name", name="uq_category_user_id_name"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("signup.id", ondelete="CASCADE"), nullable=False
+    )
+
+
 class Expense(db.Model, UserMixin):
+    __table_args__ = (
+        db.Index("ix_expense_user_id_date_id_amount", "user_id", "date", "id", "amount"),
+        db.Index("ix_expense_user_id_change_seq_id", "user_id", "change_seq", "id"),
+        db.Index("ix_expense_user_id_category_id_date", "user_id", "category_id", "date"),
+        # Ids are never handed out again, archived rows keep theirs
+        {"sqlite_autoincrement": True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     item = db.Column(db.String(100), nullable=False)
-    category = db.Column(db.String(100), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey("category.id"), nullable=False)
     amount = db.Column(db.Integer, nullable=False)
     date = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    change_seq = db.Column(db.Integer, default=0, nullable=False)  # owner's data_version at last write
 
     user_id = db.Column(
         db.Integer, db.ForeignKey("signup.id", ondelete="CASCADE"), nullable=False
     )
 
+    # Few per user and always wanted with the expense, so joined in one query
+    category = db.relationship("Category", lazy="joined", innerjoin=True)
+
 
 class Income(db.Model, UserMixin):
+    __table_args__ = (
+        db.Index("ix_income_user_id_date_id_amount", "user_id", "date", "id", "amount"),
+        db.Index("ix_income_user_id_change_seq_id", "user_id", "change_seq", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     amount = db.Column(db.Integer, nullable=False)
     date = db.Column(db.DateTime, default=datetime.now)
     note = db.Column(db.String(500), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    change_seq = db.Column(db.Integer, default=0, nullable=False)  # owner's data_version at last write
+
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("signup.id", ondelete="CASCADE"), nullable=False
+    )
+
+
+class ExpenseArchive(db.Model):
+    # Expenses older than ARCHIVE_AFTER_DAYS, moved out of `expense` with their
+    # ids so its indexes only cover recent months; read-only
+    __table_args__ = (
+        db.Index("ix_expense_archive_user_id_date_id", "user_id", "date", "id"),
+        db.Index("ix_expense_archive_user_id_change_seq_id", "user_id", "change_seq", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    item = db.Column(db.String(100), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey("category.id"), nullable=False)
+    amount = db.Column(db.Integer, nullable=False)
+    date = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    change_seq = db.Column(db.Integer, default=0, nullable=False)
+
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("signup.id", ondelete="CASCADE"), nullable=False
+    )
+
+    category = db.relationship("Category", lazy="joined", innerjoin=True)
+
+
+class IncomeArchive(db.Model):
+    # Incomes older than ARCHIVE_AFTER_DAYS, see ExpenseArchive
+    __table_args__ = (
+        db.Index("ix_income_archive_user_id_date_id", "user_id", "date", "id"),
+        db.Index("ix_income_archive_user_id_change_seq_id", "user_id", "change_seq", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    amount = db.Column(db.Integer, nullable=False)
+    date = db.Column(db.DateTime)
+    note = db.Column(db.String(500), nullable=False)
+    updated_at = db.Column(db.DateTime)
+    change_seq = db.Column(db.Integer, default=0, nullable=False)
 
     user_id = db.Column(
         db.Integer, db.ForeignKey("signup.id", ondelete="CASCADE"), nullable=False
     )
+
+
+class UserBalance(db.Model):
+    # Running totals kept in step with every income/expense write
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("signup.id", ondelete="CASCADE"), primary_key=True
+    )
+    total_income = db.Column(db.BigInteger, default=0, nullable=False)
+    total_expense = db.Column(db.BigInteger, default=0, nullable=False)
+    income_count = db.Column(db.Integer, default=0, nullable=False)
+    expense_count = db.Column(db.Integer, default=0, nullable=False)
+
+
+class MonthlyRollup(db.Model):
+    # Per month/category sums so reports never aggregate the raw rows
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("signup.id", ondelete="CASCADE"), primary_key=True
+    )
+    kind = db.Column(db.String(10), primary_key=True)  # "expense" or "income"
+    month = db.Column(db.Date, primary_key=True)  # first day of the month
+    category_id = db.Column(db.Integer, primary_key=True, default=0)  # 0 for income
+    total = db.Column(db.BigInteger, default=0, nullable=False)
+    count = db.Column(db.Integer, default=0, nullable=False)
+
+
+class Tombstone(db.Model):
+    # Deleted expense/income ids, so sync clients can drop their copies
+    __table_args__ = (
+        db.Index("ix_tombstone_user_id_change_seq", "user_id", "change_seq"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("signup.id", ondelete="CASCADE"), nullable=False
+    )
+    kind = db.Column(db.String(10), nullable=False)  # "expense" or "income"
+    row_id = db.Column(db.Integer, nullable=False)
+    change_seq = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+
+
+class LedgerEntry(db.Model):
+    # Expenses and incomes side by side with signed amounts, kept in step
+    # with both tables so timelines and balances are one range scan
+    __table_args__ = (
+        db.UniqueConstraint("kind", "source_id", name="uq_ledger_entry_kind_source_id"),
+        db.Index("ix_ledger_entry_user_id_date_id_amount", "user_id", "date", "id", "amount"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)  # "expense" or "income"
+    source_id = db.Column(db.Integer, nullable=False)  # id in the expense/income table
+    amount = db.Column(db.Integer, nullable=False)  # positive for income, negative for expense
+    date = db.Column(db.DateTime)
+    label = db.Column(db.String(500), nullable=False)  # expense item or income note
+    category_id = db.Column(db.Integer, db.ForeignKey("category.id"))
+
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("signup.id", ondelete="CASCADE"), nullable=False
+    )
+
+    category = db.relationship("Category", lazy="joined")
@@ -0,0 +1,323 @@
+from flask import Blueprint, jsonify, request
+from flask_login import current_user
+from app.utils.pagination import keyset_paginate, decode_cursor, get_per_page
+from app.utils.import_utils import (
+    DATE_FORMAT,
+    RowError,
+    parse_expense_row,
+    parse_income_row,
+)
+from app.utils.ledger_utils import get_balance, record_bulk, record_deletion, refresh_ledger
+from app.utils.filter_utils import apply_filters, parse_filters
+from app.utils.category_utils import resolve_categories
+from app.utils.archive_utils import ARCHIVES, archived_query
+from app.models import Expense, Income, Signup, Tombstone
+from sqlalchemy import delete, select, tuple_
+from datetime import datetime
+from app import db
+import binascii
+import base64
+import json
+
+
+api_bp = Blueprint("api", __name__, url_prefix="/api")
+
+MAX_BATCH_SIZE = 500
+SYNC_PAGE_SIZE = 1000
+
+# kind -> (model, row parser, writable fields)
+KINDS = {
+    "expenses": (Expense, parse_expense_row, ("item", "category", "amount", "date")),
+    "incomes": (Income, parse_income_row, ("amount", "note", "date")),
+}
+
+
+def to_dict(row, fields):
+    data = {"id": row.id}
+    for field in fields:
+        value = getattr(row, field)
+        if field == "category":
+            value = value.name
+        elif field == "date" and value:
+            value = value.strftime(DATE_FORMAT)
+        data[field] = value
+    updated_at = row.updated_at
+    data["updated_at"] = updated_at.isoformat(timespec="seconds") if updated_at else None
+    return data
+
+
+def op_id(op):
+    """The operation's integer id, None when it is missing or of any other type"""
+    value = op.get("id")
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+def ledger_values(row):
+    """The column values record_bulk needs from a row"""
+    values = {"amount": row.amount, "date": row.date}
+    if isinstance(row, Expense):
+        values["category_id"] = row.category_id
+    return values
+
+
+def sync_rows(query, model, since, cursor, after):
+    """Up to SYNC_PAGE_SIZE + 1 rows of `query` written after `since` and by
+    `cursor`, past the (change_seq, id) position `after`"""
+    query = query.filter(model.change_seq <= cursor)
+    if since is not None:
+        query = query.filter(model.change_seq > since)
+    if after:
+        query = query.filter(tuple_(model.change_seq, model.id) > tuple_(*after))
+    return query.order_by(model.change_seq, model.id).limit(SYNC_PAGE_SIZE + 1).all()
+
+
+def encode_sync_page(since, cursor, after):
+    """Opaque token for the rest of a sync, `after` maps the unfinished kinds to
+    their last (change_seq, id) sent"""
+    raw = json.dumps({"since": since, "cursor": cursor, "after": after})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_sync_page(token):
+    """Decode a sync page token back to (since, cursor, after), None if it is malformed"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded))
+        since, cursor, after = state["since"], state["cursor"], state["after"]
+        if not (since is None or isinstance(since, int)) or not isinstance(cursor, int):
+            return None
+        after = {
+            kind: (int(position[0]), int(position[1]))
+            for kind, position in after.items()
+            if kind in KINDS
+        }
+    except (ValueError, TypeError, KeyError, IndexError, AttributeError, binascii.Error):
+        return None
+    return since, cursor, after
+
+
+@api_bp.before_request
+def require_login():
+    if not current_user.is_authenticated:
+        return jsonify(error="Authentication required."), 401
+
+
+# Totals
+@api_bp.route("/totals")
+def totals():
+    balance = get_balance(current_user.id)
+    return jsonify(
+        total_income=balance.total_income,
+        total_expense=balance.total_expense,
+        balance=balance.total_income - balance.total_expense,
+        income_count=balance.income_count,
+        expense_count=balance.expense_count,
+    )
+
+
+# Paginated listing, newest first, with the history page filters
+@api_bp.route("/<kind>")
+def list_rows(kind):
+    if kind not in KINDS:
+        return jsonify(error="Unknown resource."), 404
+    model, _, fields = KINDS[kind]
+    filters = parse_filters(request.args, kind[:-1])
+
+    page = keyset_paginate(
+        apply_filters(model.query.filter_by(user_id=current_user.id), model, filters),
+        model,
+        after=decode_cursor(request.args.get("after")),
+        before=decode_cursor(request.args.get("before")),
+        per_page=get_per_page(request.args.get("per_page")),
+    )
+    return jsonify(
+        items=[to_dict(row, fields) for row in page.items],
+        next_cursor=page.next_cursor,
+        prev_cursor=page.prev_cursor,
+    )
+
+
+# Batch create/update/delete in one transaction
+@api_bp.route("/<kind>/batch", methods=["POST"])
+def batch(kind):
+    """Apply a list of operations, each reported on by its index.
+
+    Body: {"operations": [{"op": "create", ...fields},
+                          {"op": "update", "id": 1, ...fields},
+                          {"op": "delete", "id": 2}]}
+    Invalid operations are skipped and reported; the valid ones commit together.
+    """
+    if kind not in KINDS:
+        return jsonify(error="Unknown resource."), 404
+    model, parse_row, fields = KINDS[kind]
+    ledger_kind = kind[:-1]
+    user_id = current_user.id
+
+    operations = (request.get_json(silent=True) or {}).get("operations")
+    if not isinstance(operations, list):
+        return jsonify(error='Expected {"operations": [...]}.'), 400
+    if len(operations) > MAX_BATCH_SIZE:
+        return jsonify(error=f"At most {MAX_BATCH_SIZE} operations per batch."), 400
+
+    now = datetime.strptime(datetime.now().strftime(DATE_FORMAT), DATE_FORMAT)
+    results = [None] * len(operations)
+
+    # Load every row touched by an update or delete in one query
+    ids = {
+        op_id(op)
+        for op in operations
+        if isinstance(op, dict) and op.get("op") in ("update", "delete")
+    }
+    ids.discard(None)
+    existing = {}
+    if ids:
+        existing = {
+            row.id: row
+            for row in model.query.filter(model.user_id == user_id, model.id.in_(ids))
+        }
+
+    # Validate everything first, so categories are only created for valid rows
+    planned, seen_ids = [], set()
+    for index, op in enumerate(operations):
+        try:
+            if not isinstance(op, dict):
+                raise RowError("Operation must be an object.")
+            action = op.get("op")
+            if action not in ("create", "update", "delete"):
+                raise RowError('"op" must be create, update or delete.')
+
+            row = values = None
+            if action != "create":
+                if op_id(op) is None:
+                    raise RowError('"id" must be an integer.')
+                row = existing.get(op_id(op))
+                if row is None:
+                    raise RowError("Not found.")
+                if row.id in seen_ids:
+                    raise RowError("Only one operation per id in a batch.")
+                seen_ids.add(row.id)
+            if action == "create":
+                values = parse_row(op, user_id, now)
+            elif action == "update":
+                merged = to_dict(row, fields)
+                merged.update({field: op[field] for field in fields if field in op})
+                values = parse_row(merged, user_id, now)
+            planned.append((index, action, row, values))
+        except RowError as e:
+            results[index] = {"ok": False, "error": str(e)}
+
+    if ledger_kind == "expense":
+        category_ids = resolve_categories(
+            user_id, (values["category"] for _, _, _, values in planned if values)
+        )
+        for _, _, _, values in planned:
+            if values:
+                values["category_id"] = category_ids[values.pop("category")]
+
+    created, updated, added, removed, deleted_ids = [], [], [], [], set()
+    for index, action, row, values in planned:
+        if action == "create":
+            row = model(**values)
+            db.session.add(row)
+            created.append((index, row))
+            added.append(values)
+            continue
+
+        removed.append(ledger_values(row))
+        if action == "update":
+            for key, value in values.items():
+                setattr(row, key, value)
+            added.append(values)
+            updated.append(row)
+        else:
+            deleted_ids.add(row.id)
+        results[index] = {"ok": True, "id": row.id}
+
+    if added or removed:
+        # Stamp the rows before they are flushed, so each is written once
+        with db.session.no_autoflush:
+            change_seq = record_bulk(ledger_kind, user_id, added=added, removed=removed)
+        for row in updated + [row for _, row in created]:
+            row.change_seq = change_seq
+        if deleted_ids:
+            record_deletion(ledger_kind, user_id, deleted_ids, change_seq)
+    if deleted_ids:
+        for row_id in deleted_ids:
+            db.session.expunge(existing[row_id])
+        db.session.execute(
+            delete(model).where(model.user_id == user_id, model.id.in_(deleted_ids))
+        )
+    if created:
+        db.session.flush()
+        for index, row in created:
+            results[index] = {"ok": True, "id": row.id}
+    if added:
+        refresh_ledger(ledger_kind, user_id, change_seq)
+    db.session.commit()
+
+    return jsonify(results=results)
+
+
+# Changes since a cursor, for clients that mirror the ledger
+@api_bp.route("/sync")
+def sync():
+    """Rows written and ids deleted after `since`, plus the cursor to send next time.
+
+    The cursor is the user's data_version, which every write bumps and stamps
+    on the rows it touches (change_seq). Without `since` the whole ledger,
+    archived rows included, is returned as a snapshot. Changes are capped at
+    the version read up front, so a write committing mid-sync is picked up by
+    the next sync instead.
+
+    Rows come SYNC_PAGE_SIZE per kind at a time in (change_seq, id) order.
+    While `next` is set there is more: send it back as `page` and keep the
+    cursor only once `next` comes back null.
+    """
+    user_id = current_user.id
+    page = request.args.get("page")
+    if page:
+        state = decode_sync_page(page)
+        if state is None:
+            return jsonify(error="Invalid page."), 400
+        since, cursor, after = state
+    else:
+        since = request.args.get("since", type=int)
+        cursor = db.session.scalar(select(Signup.data_version).where(Signup.id == user_id))
+        after = dict.fromkeys(KINDS)
+
+    response = {"cursor": cursor, "snapshot": since is None, "deleted": {}}
+    remaining = {}
+    for kind, (model, _, fields) in KINDS.items():
+        rows = []
+        if kind in after:
+            rows = sync_rows(
+                model.query.filter(model.user_id == user_id), model, since, cursor, after[kind]
+            )
+            if since is None:
+                # Archived rows never change again, only snapshots need them. A row
+                # archived mid-sync keeps its (change_seq, id), so it is sent once
+                archive = ARCHIVES[kind[:-1]][1]
+                rows += sync_rows(
+                    archived_query(kind[:-1], user_id), archive, since, cursor, after[kind]
+                )
+                rows.sort(key=lambda row: (row.change_seq, row.id))
+            if len(rows) > SYNC_PAGE_SIZE:
+                rows = rows[:SYNC_PAGE_SIZE]
+                remaining[kind] = [rows[-1].change_seq, rows[-1].id]
+        response[kind] = [to_dict(row, fields) for row in rows]
+        response["deleted"][kind] = []
+    response["next"] = encode_sync_page(since, cursor, remaining) if remaining else None
+
+    if since is not None and not page:
+        tombstones = db.session.execute(
+            select(Tombstone.kind, Tombstone.row_id)
+            .where(
+                Tombstone.user_id == user_id,
+                Tombstone.change_seq > since,
+                Tombstone.change_seq <= cursor,
+            )
+            .order_by(Tombstone.change_seq)
+        )
+        for kind, row_id in tombstones:
+            response["deleted"][f"{kind}s"].append(row_id)
+    return jsonify(response)
@@ -2,12 +2,10 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import current_user, login_user, logout_user, login_required
 from werkzeug.security import generate_password_hash, check_password_hash
 from app.utils.country_timezone import country_timezone_map
+from app.utils.account_utils import mark_deleted, queue_account_purge
+from app.utils.avatar_storage import queue_avatar_destroy
 from app.models import Signup
-from app import db
-
-
-from cloudinary.uploader import cloudinary, upload, destroy
-from app.utils.cloudinary_utils import extract_public_id
+from app import db, shards
 
 
 auth_bp = Blueprint("auth", __name__)
@@ -37,6 +35,8 @@ def register():
             timezone=timezone,
         )
         db.session.add(new_user)
+        db.session.flush()
+        shards.place([new_user.id])
         db.session.commit()
         flash("Registration successful!", "success")
         return redirect(url_for("auth.login"))
@@ -83,11 +83,14 @@ def delete_account():
         password = request.form.get("password")
 
         if check_password_hash(user.password, password):
-            if user.profile_picture_url:
-                previous_pfp_name = extract_public_id(user.profile_picture_url)
-                destroy(previous_pfp_name)
-            db.session.delete(user)
+            previous_pfp_url = user.profile_picture_url
+            user_id = user.id
+            # Closed now, the rows go in small batches in the background
+            mark_deleted(user)
             db.session.commit()
+            queue_account_purge(user_id)
+            if previous_pfp_url:
+                queue_avatar_destroy(previous_pfp_url)
             logout_user()
             flash("Account deleted successfully!", "success")
             return redirect(url_for("auth.login"))
@@ -1,38 +1,74 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
-from flask_login import current_user, login_user, logout_user, login_required
-from app.models import Expense, Income, Signup
+from flask import (
+    Blueprint,
+    Response,
+    abort,
+    flash,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    stream_with_context,
+    url_for,
+)
+from flask_login import current_user, login_required
+from app.utils.pagination import keyset_paginate, decode_cursor, encode_cursor, get_per_page
+from app.utils.ledger_utils import (
+    balance_after,
+    cash_flow,
+    get_balance,
+    monthly_report,
+    record_deletion,
+    record_expense,
+    record_income,
+)
+from app.utils.export_utils import EXPORT_FORMATS, EXPORT_GENERATORS
+from app.utils.import_utils import IMPORT_COLUMNS, import_csv
+from app.utils.search_utils import search_paginate, search_query
+from app.utils.filter_utils import apply_filters, parse_filters
+from app.utils.archive_utils import ARCHIVES, archived_query, has_archived
+from app.utils.category_utils import category_choices, category_id_for, user_categories
+from app.utils.page_cache import cached_page
+from app.utils.replicas import use_replica
+from app.models import Expense, Income, LedgerEntry
 from datetime import datetime
-from sqlalchemy import func
 from app import db
 
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
 
+RECENT_ENTRIES = 5
+
+
 # Dashboard logic
 @dashboard_bp.route("/dashboard")
+@use_replica
 @login_required
+@cached_page
 def dashboard():
     user = current_user
     user_id = user.id
 
-    total_income = (
-        db.session.query(func.sum(Income.amount)).filter_by(user_id=user_id).scalar()
-        or 0
-    )
-
-    total_expense = (
-        db.session.query(func.sum(Expense.amount)).filter_by(user_id=user_id).scalar()
-        or 0
-    )
+    summary = get_balance(user_id)
+    total_income = summary.total_income
+    total_expense = summary.total_expense
 
     balance = total_income - total_expense
 
+    # Newest of both kinds from the one ledger index
+    recent = (
+        LedgerEntry.query.filter_by(user_id=user_id)
+        .order_by(LedgerEntry.date.desc(), LedgerEntry.id.desc())
+        .limit(RECENT_ENTRIES)
+        .all()
+    )
+
     return render_template(
         "dashboard.html",
         total_income=total_income,
         total_expense=total_expense,
         balance=balance,
+        recent=recent,
         user=user,
     )
 
@@ -68,6 +104,7 @@ def add_income():
         add_income = Income(user_id=user_id, amount=int(amount), date=date, note=note)
 
         db.session.add(add_income)
+        record_income(add_income)
         db.session.commit()
         flash("Income added successfully!", "success")
         return redirect(url_for("dashboard.income_history"))
@@ -102,9 +139,11 @@ def update_income(income_id):
             return redirect(url_for("dashboard.update_income", income_id=income_id))
 
         # Update
+        record_income(income, sign=-1)
         income.amount = int(amount)
         income.note = note
         income.date = date
+        record_income(income)
 
         # Final commit
         db.session.commit()
@@ -124,23 +163,75 @@ def delete_income(income_id):
         flash("You are not authorized to delete this income.", "danger")
         return redirect(url_for("dashboard.income_history"))
 
+    change_seq = record_income(income, sign=-1)
+    record_deletion("income", income.user_id, [income.id], change_seq)
     db.session.delete(income)
     db.session.commit()
     flash("Income deleted successfully!", "success")
     return redirect(url_for("dashboard.income_history"))
 
 
+def history_page(kind, model):
+    """One page of the user's filtered history, or of ranked search results when `q` is given.
+
+    Past the oldest live row the pages carry on into the archive table, read
+    only when asked for with `archived=1`. Also returns whether any search or
+    filter narrowed the page and whether it holds archived rows.
+    """
+    per_page = get_per_page(request.args.get("per_page"))
+    filters = parse_filters(request.args, kind)
+    q = request.args.get("q", "").strip()
+    if q:
+        # Only live rows are searchable
+        query = apply_filters(search_query(kind, current_user.id, q), model, filters)
+        cursor = request.args.get("after") or request.args.get("before")
+        return search_paginate(query, cursor, per_page), True, False
+
+    after = decode_cursor(request.args.get("after"))
+    before = decode_cursor(request.args.get("before"))
+    archive = ARCHIVES[kind][1]
+    archived = apply_filters(archived_query(kind, current_user.id), archive, filters)
+
+    if request.args.get("archived") != "1":
+        page = keyset_paginate(
+            apply_filters(model.query.filter_by(user_id=current_user.id), model, filters),
+            model,
+            after=after,
+            before=before,
+            per_page=per_page,
+        )
+        if page.next_cursor or not has_archived(archived):
+            return page, bool(filters), False
+        if page.items:
+            # Last live page, "Older" opens the archive from its newest row
+            page.next_archived = "1"
+            return page, bool(filters), False
+        # Nothing live at all, go straight to the archive
+        after = before = None
+
+    page = keyset_paginate(archived, archive, after=after, before=before, per_page=per_page)
+    if page.items and page.prev_cursor is None:
+        # Newest archived rows, "Newer" leads back to the oldest live ones
+        page.prev_cursor = encode_cursor(page.items[0].date, page.items[0].id)
+        page.prev_archived = False
+    return page, bool(filters), True
+
+
 # Income History logic
 @dashboard_bp.route("/income_history")
+@use_replica
 @login_required
+@cached_page
 def income_history():
-    incomes = (
-        Income.query.filter_by(user_id=current_user.id)
-        .order_by(Income.date.desc())
-        .all()
-    )
+    page, filtered, archived = history_page("income", Income)
 
-    return render_template("income_history.html", incomes=incomes)
+    return render_template(
+        "income_history.html",
+        incomes=page.items,
+        page=page,
+        filtered=filtered,
+        archived=archived,
+    )
 
 
 # Add expense logic
@@ -152,13 +243,16 @@ def add_expense():
 
     if request.method == "POST":
         item = request.form.get("item")
-        category = request.form.get("category")
+        category = (request.form.get("category") or "").strip()
         amount = request.form.get("amount")
         date_str = request.form.get("date")
 
         if not item or not category or not amount:
             flash("All fields are required.", "danger")
             return redirect(url_for("dashboard.add_expense"))
+        if len(category) > 100:
+            flash("Category must be at most 100 characters.", "danger")
+            return redirect(url_for("dashboard.add_expense"))
 
         # If user provides date, parse it, else use current time
         if date_str:
@@ -173,16 +267,25 @@ def add_expense():
             )
 
         add_expense = Expense(
-            user_id=user_id, item=item, category=category, amount=int(amount), date=date
+            user_id=user_id,
+            item=item,
+            category_id=category_id_for(user_id, category),
+            amount=int(amount),
+            date=date,
         )
 
         db.session.add(add_expense)
+        record_expense(add_expense)
         db.session.commit()
         flash("Expense added successfully!", "success")
         return redirect(url_for("dashboard.expense_history"))
     current_datetime = datetime.now().strftime("%Y-%m-%dT%H:%M")
 
-    return render_template("add_expense.html", current_datetime=current_datetime)
+    return render_template(
+        "add_expense.html",
+        current_datetime=current_datetime,
+        categories=category_choices(user_id),
+    )
 
 
 # Update expense logic
@@ -197,13 +300,16 @@ def update_expense(expense_id):
 
     if request.method == "POST":
         item = request.form.get("item")
-        category = request.form.get("category")
+        category = (request.form.get("category") or "").strip()
         amount = request.form.get("amount")
         date_str = request.form.get("date")
 
         if not item or not category or not amount or not date_str:
             flash("All fields are required.", "danger")
             return redirect(url_for("dashboard.update_expense", expense_id=expense_id))
+        if len(category) > 100:
+            flash("Category must be at most 100 characters.", "danger")
+            return redirect(url_for("dashboard.update_expense", expense_id=expense_id))
         try:
             date = datetime.strptime(date_str, "%Y-%m-%dT%H:%M")
         except ValueError:
@@ -211,17 +317,23 @@ def update_expense(expense_id):
             return redirect(url_for("dashboard.update_expense", expense_id=expense_id))
 
         # Update
+        record_expense(expense, sign=-1)
         expense.item = item
-        expense.category = category
-        expense.amount = amount
+        expense.category_id = category_id_for(expense.user_id, category)
+        expense.amount = int(amount)
         expense.date = date
+        record_expense(expense)
 
         # Final commit
         db.session.commit()
         flash("Expense updated successfully!", "success")
         return redirect(url_for("dashboard.expense_history"))
 
-    return render_template("update_expense.html", expense=expense)
+    return render_template(
+        "update_expense.html",
+        expense=expense,
+        categories=category_choices(expense.user_id),
+    )
 
 
 # Delete expense logic
@@ -233,6 +345,8 @@ def delete_expense(expense_id):
         flash("You are not authorized to delete this expense.", "danger")
         return redirect(url_for("dashboard.expense_history"))
 
+    change_seq = record_expense(expense, sign=-1)
+    record_deletion("expense", expense.user_id, [expense.id], change_seq)
     db.session.delete(expense)
     db.session.commit()
     flash("Expense deleted successfully!", "success")
@@ -241,12 +355,136 @@ def delete_expense(expense_id):
 
 # Expense History logic
 @dashboard_bp.route("/expense_history")
+@use_replica
 @login_required
+@cached_page
 def expense_history():
-    expenses = (
-        Expense.query.filter_by(user_id=current_user.id)
-        .order_by(Expense.date.desc())
-        .all()
+    page, filtered, archived = history_page("expense", Expense)
+
+    return render_template(
+        "expense_history.html",
+        expenses=page.items,
+        page=page,
+        filtered=filtered,
+        archived=archived,
+        categories=user_categories(current_user.id),
     )
 
-    return render_template("expense_history.html", expenses=expenses)
+
+# Combined history logic
+@dashboard_bp.route("/transactions")
+@use_replica
+@login_required
+@cached_page
+def transactions():
+    user_id = current_user.id
+    # Only dates apply here, amounts are signed and categories expense-only
+    filters = {
+        key: value
+        for key, value in parse_filters(request.args, "transaction").items()
+        if key in ("from", "to")
+    }
+    query = apply_filters(LedgerEntry.query.filter_by(user_id=user_id), LedgerEntry, filters)
+
+    page = keyset_paginate(
+        query,
+        LedgerEntry,
+        after=decode_cursor(request.args.get("after")),
+        before=decode_cursor(request.args.get("before")),
+        per_page=get_per_page(request.args.get("per_page")),
+    )
+
+    # Running balance down the page, starting from the balance after its newest row
+    balances = []
+    if page.items:
+        balance = balance_after(user_id, page.items[0])
+        for entry in page.items:
+            balances.append(balance)
+            balance -= entry.amount
+
+    if filters:
+        flow = cash_flow(query)
+    else:
+        summary = get_balance(user_id)
+        flow = {
+            "in": summary.total_income,
+            "out": summary.total_expense,
+            "net": summary.total_income - summary.total_expense,
+        }
+
+    return render_template(
+        "transactions.html",
+        entries=list(zip(page.items, balances)),
+        page=page,
+        flow=flow,
+        filtered=bool(filters),
+    )
+
+
+# Analytics logic
+def get_report_months():
+    months = request.args.get("months", 12, type=int)
+    return min(max(months, 1), 600)
+
+
+@dashboard_bp.route("/analytics")
+@use_replica
+@login_required
+@cached_page
+def analytics():
+    months = get_report_months()
+    report = monthly_report(current_user.id, months=months)
+
+    return render_template("analytics.html", report=report, months=months)
+
+
+@dashboard_bp.route("/analytics/data")
+@use_replica
+@login_required
+def analytics_data():
+    return jsonify(monthly_report(current_user.id, months=get_report_months()))
+
+
+# Bulk CSV import logic
+@dashboard_bp.route("/import", methods=["GET", "POST"])
+@login_required
+def import_data():
+    if request.method == "POST":
+        kind = request.form.get("kind")
+        upload = request.files.get("file")
+
+        if kind not in IMPORT_COLUMNS or not upload or not upload.filename:
+            flash("Choose a CSV file and what it contains.", "danger")
+            return redirect(url_for("dashboard.import_data"))
+
+        try:
+            result = import_csv(upload.stream, kind, current_user.id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            flash("Import failed. Please try again.", "danger")
+            return redirect(url_for("dashboard.import_data"))
+
+        category = "warning" if result.error_count else "success"
+        flash(f"Imported {result.imported} {kind} rows.", category)
+        return render_template(
+            "import_data.html", columns=IMPORT_COLUMNS, kind=kind, result=result
+        )
+
+    return render_template("import_data.html", columns=IMPORT_COLUMNS, kind="expense")
+
+
+# Streaming export logic
+@dashboard_bp.route("/export/<kind>.<fmt>")
+@login_required
+def export_data(kind, fmt):
+    if kind not in ("expense", "income") or fmt not in EXPORT_FORMATS:
+        abort(404)
+
+    rows = EXPORT_GENERATORS[fmt](kind, current_user.id)
+    filename = f"trackly_{kind}s.{fmt}"
+    return Response(
+        stream_with_context(rows),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
@@ -1,11 +1,30 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import (
+    Blueprint,
+    abort,
+    flash,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    send_from_directory,
+    url_for,
+)
 from werkzeug.security import generate_password_hash, check_password_hash
 from app.utils.country_timezone import country_timezone_map
-from cloudinary.uploader import cloudinary, upload, destroy
-from app.utils.cloudinary_utils import extract_public_id
+from app.utils.avatar_storage import (
+    AVATAR_URL_PREFIX,
+    LocalStorage,
+    check_image,
+    get_storage,
+    queue_avatar_destroy,
+    queue_avatar_upload,
+)
+from app.utils.ledger_utils import bump_data_version
+from app.utils.replicas import use_replica
 from flask_login import current_user, login_required
 from app.models import Signup
-from app import db
+from sqlalchemy import select
+from app import db, user_cache
 import os
 
 settings_bp = Blueprint("settings", __name__)
@@ -13,6 +32,7 @@ settings_bp = Blueprint("settings", __name__)
 
 # Settings page
 @settings_bp.route("/settings")
+@use_replica
 @login_required
 def settings():
     user = current_user
@@ -42,6 +62,7 @@ def update_profile():
             user.country = country
 
         # Final commit
+        bump_data_version(user.id)
         db.session.commit()
         flash("Profile updated successfully!", "success")
     return redirect(url_for("settings.settings"))
@@ -62,58 +83,65 @@ def upload_profile_picture():
         if file_size > max_file_size:
             flash("File is lager then 2 MB", 'danger')
             return redirect(url_for('settings.settings'))
-        try:
-            result = cloudinary.uploader.upload(
-                profile_picture,
-                folder="trackly_profile_pics",
-                transformation=[
-                    {
-                        "width": 200,
-                        "height": 200,
-                        "crop": "thumb",
-                        "radius": "max",
-                    }
-                ],
-            )
-            new_pfp_url = result.get("secure_url")
-
-            if new_pfp_url:
-                if user.profile_picture_url:
-                    try:
-                        previous_pfp_name = extract_public_id(user.profile_picture_url)
-                        destroy(previous_pfp_name)
-                    except Exception as e:
-                        flash("Some error occured. Please try again.", "danger")
-                user.profile_picture_url = new_pfp_url
-
-        except Exception as e:
-            flash("Image upload failed. Please try again.", "danger")
+
+        data = profile_picture.read()
+        if not check_image(data):
+            flash("Please choose an image file.", "danger")
             return redirect(url_for("settings.settings"))
-        # Final commit
+
+        # Resize and upload run in the background, the page picks up the new url when done
+        user.avatar_status = "uploading"
+        bump_data_version(user.id)
         db.session.commit()
-        flash("Profile picture uploaded successfully", "success")
+        queue_avatar_upload(user.id, data)
+        flash("Uploading your profile picture...", "info")
     else:
         flash('No file selected', 'danger')
     return redirect(url_for("settings.settings"))
 
 
+# Profile picture upload status, polled by the settings page
+@settings_bp.route("/settings/avatar-status")
+@login_required
+def avatar_status():
+    # Read from the database, the upload job's commit may not have reached
+    # this process's user cache yet
+    status, url = db.session.execute(
+        select(Signup.avatar_status, Signup.profile_picture_url).where(
+            Signup.id == current_user.id
+        )
+    ).one()
+    return jsonify(status=status, url=url)
+
+
+# Locally stored profile pictures, named once per upload so cached for a year
+@settings_bp.route(f"{AVATAR_URL_PREFIX}/<filename>")
+def avatar_file(filename):
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        abort(404)
+
+    response = send_from_directory(storage.directory, filename, max_age=31536000)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
 # Remove profile picture
 @settings_bp.route("/settings/remove-profile-picture", methods=["POST"])
 @login_required
 def remove_profile_picture():
     user = current_user
     if user.profile_picture_url:
-        try:
-            previous_pfp_name = extract_public_id(user.profile_picture_url)
-            destroy(previous_pfp_name)
-            user.profile_picture_url = None
-        except Exception as e:
-            flash("Some error occured. Please try again.", "danger")
-            return redirect(url_for("settings.settings"))
-    
+        previous_pfp_url = user.profile_picture_url
+        user.profile_picture_url = None
+        user.avatar_status = None
+
         # Final commit
+        bump_data_version(user.id)
         db.session.commit()
-        flash("Profile picture uploaded successfully", "success")
+        queue_avatar_destroy(previous_pfp_url)
+        flash("Profile picture removed successfully", "success")
     return redirect(url_for("settings.settings"))
 
 
@@ -131,6 +159,7 @@ def update_password():
         if check_password_hash(user.password, current_password):
             if new_password == confirm_password:
                 user.password = generate_password_hash(new_password)
+                user_cache.invalidate(db.session, user.id)
             else:
                 flash("Password not match!", "warning")
                 return redirect(url_for("auth.settings"))
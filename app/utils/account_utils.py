@@ -0,0 +1,74 @@
+from app.utils.ledger_utils import bump_data_version
+from app.utils.shards import PURGE_ORDER
+from sqlalchemy import delete, func, select
+from flask import current_app
+from app.models import Signup
+from app import db, jobs, shards
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def mark_deleted(user):
+    """Close the account at once; its rows are purged later by purge_account.
+
+    The email is released so the address can sign up again straight away.
+    """
+    user.deleted_at = datetime.now()
+    user.email = f"deleted-{user.id}@deleted.invalid"
+    user.profile_picture_url = None
+    bump_data_version(user.id)
+
+
+def purge_account(user_id):
+    """Delete a closed account's rows in throttled batches, then the account itself.
+
+    Safe to run again after a failure, it carries on where it stopped.
+    Returns the number of rows deleted.
+    """
+    user = db.session.get(Signup, user_id)
+    if user is None or user.deleted_at is None:
+        return 0
+    shard = user.shard
+    db.session.rollback()  # hold no transaction over the batches
+
+    def report(table, deleted):
+        logger.info("Purging account %s: %s rows deleted, now at %s", user_id, deleted, table)
+
+    deleted = shards.purge_user(
+        user_id,
+        shard,
+        batch_size=current_app.config.get("ACCOUNT_PURGE_BATCH_SIZE", 1000),
+        pause=current_app.config.get("ACCOUNT_PURGE_PAUSE", 0.05),
+        progress=report,
+    )
+    # Nothing is left for the cascade, so this is a single-row delete
+    db.session.execute(delete(Signup).where(Signup.id == user_id))
+    db.session.commit()
+    logger.info("Purged account %s, %s rows deleted", user_id, deleted)
+    return deleted
+
+
+def queue_account_purge(user_id):
+    """Purge a closed account in the background"""
+    jobs.submit_with_app(purge_account, user_id)
+
+
+def pending_purges():
+    """Closed accounts whose rows are still being purged, oldest first"""
+    return db.session.scalars(
+        select(Signup).where(Signup.deleted_at.isnot(None)).order_by(Signup.deleted_at)
+    ).all()
+
+
+def remaining_rows(user):
+    """Rows a closed account still has on its shard, by table"""
+    tables = db.metadata.tables
+    with shards.engine(user.shard).connect() as connection:
+        return {
+            name: connection.scalar(
+                select(func.count()).select_from(tables[name]).where(tables[name].c.user_id == user.id)
+            )
+            for name in PURGE_ORDER
+        }
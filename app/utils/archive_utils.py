@@ -0,0 +1,80 @@
+from app.models import Expense, ExpenseArchive, Income, IncomeArchive, LedgerEntry
+from app.utils.ledger_utils import bump_data_version
+from sqlalchemy import delete, insert, select
+from datetime import datetime, timedelta
+from app import db
+import time
+
+# kind -> (live model, archive model)
+ARCHIVES = {
+    "expense": (Expense, ExpenseArchive),
+    "income": (Income, IncomeArchive),
+}
+
+
+def archive_cutoff(days):
+    """Rows dated before this are archived"""
+    return datetime.now() - timedelta(days=days)
+
+
+def archive_user(user_id, cutoff, batch_size=1000, pause=0):
+    """Move the user's rows dated before `cutoff` into the archive tables.
+
+    Works on the session's shard, one committed batch at a time over the
+    (user_id, date) index. Balances and rollups are left as they are, so the
+    dashboard and analytics still count the archived rows; their ledger
+    entries and search index entries go with them. Each batch bumps the
+    user's data version. Returns the rows moved.
+    """
+    moved = 0
+    for kind, (model, archive) in ARCHIVES.items():
+        columns = [column.key for column in archive.__table__.columns]
+        while True:
+            ids = db.session.scalars(
+                select(model.id)
+                .where(model.user_id == user_id, model.date < cutoff)
+                .limit(batch_size)
+            ).all()
+            if not ids:
+                break
+            # Cached pages and ETags still show these rows with Edit/Delete links
+            bump_data_version(user_id)
+            db.session.execute(
+                insert(archive).from_select(
+                    columns,
+                    select(*(getattr(model, name) for name in columns)).where(model.id.in_(ids)),
+                )
+            )
+            db.session.execute(
+                delete(LedgerEntry).where(LedgerEntry.kind == kind, LedgerEntry.source_id.in_(ids))
+            )
+            db.session.execute(
+                delete(model)
+                .where(model.id.in_(ids))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            moved += len(ids)
+            if len(ids) < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+    return moved
+
+
+def archived_query(kind, user_id):
+    """Query over the user's archived rows of `kind`"""
+    archive = ARCHIVES[kind][1]
+    return archive.query.filter(archive.user_id == user_id)
+
+
+def has_archived(query):
+    return db.session.query(query.exists()).scalar()
+
+
+def duplicate_ids(kind):
+    """Ids found both live and archived on the session's shard, which should never happen"""
+    model, archive = ARCHIVES[kind]
+    return db.session.scalars(
+        select(model.id).join(archive, archive.id == model.id).order_by(model.id)
+    ).all()
@@ -0,0 +1,186 @@
+from app.utils.cloudinary_utils import extract_public_id
+from app.utils.ledger_utils import bump_data_version
+from urllib.parse import urlparse
+from flask import current_app
+from app.models import Signup
+from app import db, jobs
+import cloudinary.uploader
+import uuid
+import io
+import os
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional, uploads then skip the local resize
+    Image = ImageOps = None
+
+
+AVATAR_SIZE = 200
+AVATAR_URL_PREFIX = "/avatars"
+IMAGE_FORMATS = {"webp": ("WEBP", ".webp"), "jpeg": ("JPEG", ".jpg")}
+
+
+def check_image(data: bytes):
+    """Cheap header check so obviously broken files are refused in the request"""
+    if Image is None:
+        return True
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+        return True
+    except Exception:
+        return False
+
+
+def make_thumbnail(data: bytes, image_format="webp"):
+    """Center-crop to AVATAR_SIZE square and re-encode, returns (bytes, extension)"""
+    if Image is None:
+        # Without Pillow the original goes up as is and the backend has to crop it
+        return data, ""
+
+    pil_format, extension = IMAGE_FORMATS[image_format]
+    with Image.open(io.BytesIO(data)) as image:
+        # Let the JPEG decoder downscale while decoding, far cheaper than a full decode
+        image.draft("RGB", (AVATAR_SIZE * 2, AVATAR_SIZE * 2))
+        image = ImageOps.exif_transpose(image)
+        image = ImageOps.fit(image, (AVATAR_SIZE, AVATAR_SIZE), Image.LANCZOS)
+        if pil_format == "JPEG" or image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB")
+
+        output = io.BytesIO()
+        image.save(output, pil_format, quality=82, optimize=True)
+    return output.getvalue(), extension
+
+
+class AvatarStorage:
+    """Stores avatars after shrinking them to a small thumbnail locally"""
+
+    def __init__(self, image_format="webp"):
+        self.image_format = image_format
+
+    def upload(self, data: bytes):
+        thumbnail, extension = make_thumbnail(data, self.image_format)
+        return self.put(thumbnail, extension)
+
+    def put(self, data: bytes, extension: str):
+        raise NotImplementedError
+
+    def destroy(self, url: str):
+        raise NotImplementedError
+
+
+class CloudinaryStorage(AvatarStorage):
+    """Avatars on Cloudinary, rounded to a circle on delivery"""
+
+    folder = "trackly_profile_pics"
+
+    def put(self, data, extension):
+        result = cloudinary.uploader.upload(
+            io.BytesIO(data),
+            folder=self.folder,
+            transformation=[
+                {
+                    "width": AVATAR_SIZE,
+                    "height": AVATAR_SIZE,
+                    "crop": "thumb",
+                    "radius": "max",
+                }
+            ],
+        )
+        return result["secure_url"]
+
+    def destroy(self, url):
+        cloudinary.uploader.destroy(extract_public_id(url))
+
+
+class LocalStorage(AvatarStorage):
+    """Avatars on the local disk, served by the app under AVATAR_URL_PREFIX"""
+
+    def __init__(self, directory, image_format="webp"):
+        super().__init__(image_format)
+        self.directory = directory
+
+    def put(self, data, extension):
+        # A fresh name per upload is never reused, so it can be cached forever,
+        # and destroying one user's avatar never touches another's
+        filename = f"{uuid.uuid4().hex}{extension}"
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, filename)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        return f"{AVATAR_URL_PREFIX}/{filename}"
+
+    def destroy(self, url):
+        filename = os.path.basename(urlparse(url).path)
+        try:
+            os.remove(os.path.join(self.directory, filename))
+        except FileNotFoundError:
+            pass
+
+
+class FakeStorage(AvatarStorage):
+    """Keeps avatars in memory, for tests and offline development"""
+
+    def __init__(self, image_format="webp"):
+        super().__init__(image_format)
+        self.files = {}
+
+    def put(self, data, extension):
+        url = f"memory://trackly_profile_pics/{uuid.uuid4().hex}{extension}"
+        self.files[url] = data
+        return url
+
+    def destroy(self, url):
+        self.files.pop(url, None)
+
+
+def create_storage(app):
+    backend = app.config.get("AVATAR_STORAGE", "cloudinary")
+    image_format = app.config.get("AVATAR_FORMAT", "webp")
+    if backend == "local":
+        directory = app.config.get("AVATAR_LOCAL_DIR") or os.path.join(
+            app.instance_path, "avatars"
+        )
+        return LocalStorage(directory, image_format)
+    if backend == "fake":
+        return FakeStorage(image_format)
+    return CloudinaryStorage(image_format)
+
+
+def get_storage():
+    return current_app.extensions["avatar_storage"]
+
+
+def queue_avatar_upload(user_id, data):
+    """Upload a new avatar in the background and swap it in when it is stored"""
+    storage = get_storage()
+
+    def uploaded(new_url):
+        user = db.session.get(Signup, user_id)
+        if user is None:
+            # Account deleted while the upload was running
+            queue_avatar_destroy(new_url)
+            return
+        old_url = user.profile_picture_url
+        user.profile_picture_url = new_url
+        user.avatar_status = "ready"
+        bump_data_version(user_id)
+        db.session.commit()
+        if old_url and old_url != new_url:
+            queue_avatar_destroy(old_url)
+
+    def failed(error):
+        user = db.session.get(Signup, user_id)
+        if user is not None:
+            user.avatar_status = "failed"
+            bump_data_version(user_id)
+            db.session.commit()
+
+    jobs.submit(storage.upload, data, on_success=uploaded, on_failure=failed)
+
+
+def queue_avatar_destroy(url):
+    """Delete a stored avatar in the background, retried on failure"""
+    jobs.submit(get_storage().destroy, url)
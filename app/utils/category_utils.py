@@ -0,0 +1,70 @@
+from sqlalchemy.exc import IntegrityError
+from app.models import Category
+from sqlalchemy import select
+from app import db
+
+# Offered to every user, created on first use like any other name
+DEFAULT_CATEGORIES = (
+    "Food & Groceries",
+    "Transportation",
+    "Housing & Utilities",
+    "Personal & Health",
+    "Entertainment & Leisure",
+    "Education & Work",
+    "Others",
+)
+
+
+def user_categories(user_id):
+    """The user's categories as (id, name) pairs, by name"""
+    return db.session.execute(
+        select(Category.id, Category.name)
+        .where(Category.user_id == user_id)
+        .order_by(Category.name)
+    ).all()
+
+
+def category_choices(user_id):
+    """Names for the category picker: the defaults, then the user's own"""
+    own = [name for _, name in user_categories(user_id) if name not in DEFAULT_CATEGORIES]
+    return list(DEFAULT_CATEGORIES) + own
+
+
+def resolve_categories(user_id, names):
+    """Map category names to the user's category ids, creating the missing ones"""
+    names = set(names)
+    if not names:
+        return {}
+    ids = dict(
+        db.session.execute(
+            select(Category.name, Category.id).where(
+                Category.user_id == user_id, Category.name.in_(names)
+            )
+        ).all()
+    )
+
+    for name in sorted(names - ids.keys()):
+        category = Category(user_id=user_id, name=name)
+        try:
+            with db.session.begin_nested():
+                db.session.add(category)
+            ids[name] = category.id
+        except IntegrityError:
+            # A concurrent write created it first
+            ids[name] = db.session.scalar(
+                select(Category.id).where(Category.user_id == user_id, Category.name == name)
+            )
+    return ids
+
+
+def category_id_for(user_id, name):
+    return resolve_categories(user_id, [name])[name]
+
+
+def with_category_ids(user_id, rows):
+    """Copies of expense dicts with their "category" name swapped for a "category_id" """
+    rows = [dict(row) for row in rows]
+    ids = resolve_categories(user_id, (row["category"] for row in rows))
+    for row in rows:
+        row["category_id"] = ids[row.pop("category")]
+    return rows
@@ -1,5 +1,13 @@
+from urllib.parse import urlparse
+import os
+import re
+
+
 def extract_public_id(url: str):
-    """Extract public_id from Cloudinary URL"""
-    splitted_list = url.split("/")
-    public_id = f"{splitted_list[-2]}/{splitted_list[-1].split('.')[0]}"
-    return public_id
+    """Extract public_id from a Cloudinary delivery URL (any folder depth)"""
+    path = urlparse(url).path.partition("/upload/")[2]
+    parts = path.split("/")
+    # Drop the optional version segment, e.g. "v1723456789"
+    if parts and re.fullmatch(r"v\d+", parts[0]):
+        parts = parts[1:]
+    return os.path.splitext("/".join(parts))[0]
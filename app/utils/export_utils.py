@@ -0,0 +1,68 @@
+from app.utils.import_utils import DATE_FORMAT
+from app.utils.archive_utils import ARCHIVES
+from app.models import Category
+from sqlalchemy import select
+from app import db
+import json
+import csv
+import io
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+EXPORT_FIELDS = {
+    "expense": ("id", "item", "category", "amount", "date"),
+    "income": ("id", "amount", "note", "date"),
+}
+YIELD_PER = 1000
+
+
+def iter_ledger_rows(kind, user_id):
+    """Yield a user's rows as dicts through a server-side cursor, archived (oldest) first"""
+    live, archive = ARCHIVES[kind]
+    for model in (archive, live):
+        columns = [
+            Category.name.label(field) if field == "category" else getattr(model, field)
+            for field in EXPORT_FIELDS[kind]
+        ]
+        statement = select(*columns)
+        if kind == "expense":
+            statement = statement.join(Category, Category.id == model.category_id)
+        statement = (
+            statement.where(model.user_id == user_id)
+            .order_by(model.date, model.id)
+            .execution_options(yield_per=YIELD_PER)
+        )
+
+        for row in db.session.execute(statement):
+            data = row._asdict()
+            data["date"] = data["date"].strftime(DATE_FORMAT) if data["date"] else ""
+            yield data
+
+
+def generate_csv(kind, user_id):
+    """Yield the export as CSV text, one chunk per YIELD_PER rows"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS[kind])
+    writer.writeheader()
+
+    for count, row in enumerate(iter_ledger_rows(kind, user_id), start=1):
+        writer.writerow(row)
+        if count % YIELD_PER == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def generate_ndjson(kind, user_id):
+    """Yield the export as one JSON object per line"""
+    chunk = []
+    for row in iter_ledger_rows(kind, user_id):
+        chunk.append(json.dumps(row))
+        if len(chunk) >= YIELD_PER:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+EXPORT_GENERATORS = {"csv": generate_csv, "ndjson": generate_ndjson}
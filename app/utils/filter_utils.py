@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+FILTER_DATE_FORMAT = "%Y-%m-%d"
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value or "", FILTER_DATE_FORMAT)
+    except ValueError:
+        return None
+
+
+def parse_filters(args, kind):
+    """History filters from a query string; missing or invalid values are left out"""
+    filters = {}
+    for key in ("from", "to"):
+        value = _parse_date(args.get(key))
+        if value is not None:
+            filters[key] = value
+    for key in ("category", "min_amount", "max_amount"):
+        value = args.get(key, type=int)
+        if value is not None:
+            filters[key] = value
+    if kind != "expense":
+        filters.pop("category", None)
+    return filters
+
+
+def apply_filters(query, model, filters):
+    """Narrow `query` in SQL; (user_id, date, amount) and (user_id, category_id, date) serve these"""
+    if "from" in filters:
+        query = query.filter(model.date >= filters["from"])
+    if "to" in filters:
+        # The end date is inclusive
+        query = query.filter(model.date < filters["to"] + timedelta(days=1))
+    if "category" in filters:
+        query = query.filter(model.category_id == filters["category"])
+    if "min_amount" in filters:
+        query = query.filter(model.amount >= filters["min_amount"])
+    if "max_amount" in filters:
+        query = query.filter(model.amount <= filters["max_amount"])
+    return query
@@ -0,0 +1,144 @@
+from app.utils.category_utils import with_category_ids
+from app.utils.ledger_utils import BulkChange, bump_data_version, refresh_ledger
+from app.models import Expense, Income
+from datetime import datetime
+from sqlalchemy import insert
+from app import db
+import csv
+import io
+
+DATE_FORMAT = "%Y-%m-%dT%H:%M"
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+IMPORT_COLUMNS = {
+    "expense": ("item", "category", "amount", "date"),
+    "income": ("amount", "note", "date"),
+}
+
+
+class RowError(ValueError):
+    pass
+
+
+def _text(row, key):
+    value = row.get(key)
+    return "" if value is None else str(value).strip()
+
+
+def _parse_amount(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowError(f"Invalid amount {value!r}.")
+
+
+def _parse_date(value, default):
+    # Same rules as the add forms: optional, "%Y-%m-%dT%H:%M"
+    if not value:
+        return default
+    try:
+        return datetime.strptime(value, DATE_FORMAT)
+    except ValueError:
+        raise RowError(f"Invalid date {value!r}, expected YYYY-MM-DDTHH:MM.")
+
+
+def parse_expense_row(row, user_id, now):
+    item = _text(row, "item")
+    category = _text(row, "category")
+    amount = _text(row, "amount")
+    if not item or not category or not amount:
+        raise RowError("item, category and amount are required.")
+    if len(item) > 100 or len(category) > 100:
+        raise RowError("item and category must be at most 100 characters.")
+
+    return {
+        "user_id": user_id,
+        "item": item,
+        "category": category,
+        "amount": _parse_amount(amount),
+        "date": _parse_date(_text(row, "date"), now),
+    }
+
+
+def parse_income_row(row, user_id, now):
+    amount = _text(row, "amount")
+    note = _text(row, "note")
+    if not amount or not note:
+        raise RowError("amount and note are required.")
+    if len(note) > 500:
+        raise RowError("note must be at most 500 characters.")
+
+    return {
+        "user_id": user_id,
+        "amount": _parse_amount(amount),
+        "note": note,
+        "date": _parse_date(_text(row, "date"), now),
+    }
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.error_count = 0
+        self.errors = []  # (line number, message), capped at MAX_REPORTED_ERRORS
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def import_csv(binary_stream, kind, user_id):
+    """Stream a CSV upload into the ledger in batched inserts, one transaction.
+
+    Rows are parsed one at a time and flushed every BATCH_SIZE rows as a single
+    executemany, so memory stays flat however large the file is. Summaries,
+    the ledger and the data version are updated once at the end. Invalid rows
+    are skipped and reported; the caller commits or rolls back.
+    """
+    model = Expense if kind == "expense" else Income
+    parse_row = parse_expense_row if kind == "expense" else parse_income_row
+    now = datetime.strptime(datetime.now().strftime(DATE_FORMAT), DATE_FORMAT)
+    result = ImportResult()
+
+    text_stream = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text_stream)
+    missing = set(IMPORT_COLUMNS[kind]) - {"date"} - set(reader.fieldnames or [])
+    if missing:
+        result.add_error(1, f"Missing column(s): {', '.join(sorted(missing))}.")
+        return result
+
+    change_seq = bump_data_version(user_id)
+    change = BulkChange(kind)
+    batch = []
+    try:
+        for row in reader:
+            try:
+                batch.append(parse_row(row, user_id, now))
+            except RowError as e:
+                result.add_error(reader.line_num, str(e))
+                continue
+
+            if len(batch) >= BATCH_SIZE:
+                _insert_batch(model, kind, user_id, batch, change_seq, change)
+                result.imported += len(batch)
+                batch = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        result.add_error(reader.line_num, f"Could not read file: {e}")
+
+    if batch:
+        _insert_batch(model, kind, user_id, batch, change_seq, change)
+        result.imported += len(batch)
+    if result.imported:
+        change.apply(user_id)
+        refresh_ledger(kind, user_id, change_seq)
+    text_stream.detach()
+    return result
+
+
+def _insert_batch(model, kind, user_id, batch, change_seq, change):
+    if kind == "expense":
+        batch = with_category_ids(user_id, batch)
+    change.add(batch)
+    db.session.execute(insert(model), [{**row, "change_seq": change_seq} for row in batch])
@@ -0,0 +1,107 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from werkzeug.utils import import_string
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def run_with_retries(func, args, retries, delay):
+    """Call `func(*args)`, retrying with exponential backoff. Module level so it pickles"""
+    for attempt in range(retries + 1):
+        try:
+            return func(*args)
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(delay * 2**attempt)
+
+
+def run_in_app_context(func, *args):
+    """Call `func(*args)` inside an app context so it can use the database.
+
+    Module level so it pickles; worker processes started without the app build their own.
+    """
+    from app import create_app, jobs
+
+    with (jobs.app or create_app()).app_context():
+        return func(*args)
+
+
+class SyncRunner:
+    """Runs jobs inline, for tests and one-off scripts"""
+
+    def submit(self, func, *args):
+        from concurrent.futures import Future
+
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class JobExecutor:
+    """Runs slow side effects (storage uploads and deletes) off the request thread.
+
+    `submit` hands the call to a pool and returns at once. When it finishes,
+    `on_success(result)` or `on_failure(error)` run inside an app context, so
+    they can record the outcome in the database.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.runner = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.retries = app.config.get("JOB_MAX_RETRIES", 3)
+        self.retry_delay = app.config.get("JOB_RETRY_DELAY", 1.0)
+        workers = app.config.get("JOB_WORKERS", 4)
+
+        backend = app.config.get("JOB_EXECUTOR", "thread")
+        if backend == "thread":
+            self.runner = ThreadPoolExecutor(workers, thread_name_prefix="trackly-job")
+        elif backend == "process":
+            self.runner = ProcessPoolExecutor(workers)
+        elif backend == "sync":
+            self.runner = SyncRunner()
+        else:
+            # Dotted path to a queue-backed runner with a concurrent.futures API
+            self.runner = import_string(backend)(app)
+        app.extensions["jobs"] = self
+
+    def submit(self, func, *args, on_success=None, on_failure=None):
+        future = self.runner.submit(
+            run_with_retries, func, args, self.retries, self.retry_delay
+        )
+        future.add_done_callback(
+            lambda done: self._finish(done, func, on_success, on_failure)
+        )
+        return future
+
+    def submit_with_app(self, func, *args, on_success=None, on_failure=None):
+        """Like submit, for jobs that need an app context (database access)"""
+        return self.submit(
+            run_in_app_context, func, *args, on_success=on_success, on_failure=on_failure
+        )
+
+    def _finish(self, future, func, on_success, on_failure):
+        with self.app.app_context():
+            error = future.exception()
+            try:
+                if error is None:
+                    if on_success:
+                        on_success(future.result())
+                else:
+                    logger.error("Job %s failed: %s", getattr(func, "__qualname__", func), error)
+                    if on_failure:
+                        on_failure(error)
+            except Exception:
+                logger.exception("Job callback for %s failed", func)
@@ -0,0 +1,413 @@
+from sqlalchemy import (
+    Date,
+    case,
+    cast,
+    delete,
+    func,
+    insert,
+    literal_column,
+    null,
+    select,
+    tuple_,
+    type_coerce,
+    union_all,
+    update,
+)
+from app.models import (
+    Category,
+    Expense,
+    ExpenseArchive,
+    Income,
+    IncomeArchive,
+    LedgerEntry,
+    MonthlyRollup,
+    Signup,
+    Tombstone,
+    UserBalance,
+)
+from app.utils.shards import ShardMovedError
+from sqlalchemy.exc import IntegrityError
+from datetime import date, datetime
+from app import db, user_cache
+
+
+def bump_data_version(user_id):
+    """Invalidate every cached page and ETag of the user, returns the new version.
+
+    The version doubles as the user's change sequence for sync: the UPDATE
+    locks the user's row until commit, so versions are handed out in commit order.
+    It also fences shard moves: writing to a shard the user has left raises
+    ShardMovedError.
+    """
+    statement = (
+        update(Signup)
+        .where(Signup.id == user_id)
+        .values(data_version=Signup.data_version + 1)
+    )
+    if db.session.get_bind().dialect.update_returning:
+        version, shard = db.session.execute(
+            statement.returning(Signup.data_version, Signup.shard)
+        ).one()
+    else:
+        db.session.execute(statement)
+        version, shard = db.session.execute(
+            select(Signup.data_version, Signup.shard).where(Signup.id == user_id)
+        ).one()
+    if db.session.info.get("shard") not in (None, shard):
+        raise ShardMovedError(f"User {user_id} moved to shard {shard}, retry the request.")
+    user_cache.invalidate(db.session, user_id)
+    return version
+
+
+def adjust_balance(user_id, income=0, expense=0, income_count=0, expense_count=0):
+    """Apply a delta to the user's balance summary inside the current transaction"""
+    # A missing row is rebuilt from the raw rows on its next read, so it is skipped here
+    db.session.execute(
+        update(UserBalance)
+        .where(UserBalance.user_id == user_id)
+        .values(
+            total_income=UserBalance.total_income + income,
+            total_expense=UserBalance.total_expense + expense,
+            income_count=UserBalance.income_count + income_count,
+            expense_count=UserBalance.expense_count + expense_count,
+        )
+    )
+
+
+def month_start(value):
+    """First day of the month `value` falls in"""
+    return date(value.year, value.month, 1)
+
+
+def month_expr(column):
+    """SQL expression truncating a datetime column to the first day of its month"""
+    # Constants are inlined so GROUP BY repeats the exact same expression
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite":
+        return type_coerce(func.date(column, literal_column("'start of month'")), Date)
+    if dialect == "postgresql":
+        return cast(func.date_trunc(literal_column("'month'"), column), Date)
+    return cast(func.date_format(column, literal_column("'%Y-%m-01'")), Date)
+
+
+def adjust_rollup(user_id, kind, month, category_id, amount, count):
+    """Apply a delta to one (user, kind, month, category) rollup row"""
+    key = (
+        (MonthlyRollup.user_id == user_id)
+        & (MonthlyRollup.kind == kind)
+        & (MonthlyRollup.month == month)
+        & (MonthlyRollup.category_id == category_id)
+    )
+    values = dict(
+        total=MonthlyRollup.total + amount, count=MonthlyRollup.count + count
+    )
+    result = db.session.execute(
+        update(MonthlyRollup)
+        .where(key)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount or count <= 0:
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(
+                MonthlyRollup(
+                    user_id=user_id,
+                    kind=kind,
+                    month=month,
+                    category_id=category_id,
+                    total=amount,
+                    count=count,
+                )
+            )
+    except IntegrityError:
+        # A concurrent write created the row first, add to it instead
+        db.session.execute(
+            update(MonthlyRollup)
+            .where(key)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def record_income(income, sign=1):
+    """Add (sign=1) or remove (sign=-1) an income from the user's summaries"""
+    change_seq = bump_data_version(income.user_id)
+    adjust_balance(income.user_id, income=sign * income.amount, income_count=sign)
+    adjust_rollup(
+        income.user_id, "income", month_start(income.date), 0, sign * income.amount, sign
+    )
+    if sign > 0:
+        income.change_seq = change_seq
+        refresh_ledger("income", income.user_id, change_seq)
+    return change_seq
+
+
+def record_expense(expense, sign=1):
+    """Add (sign=1) or remove (sign=-1) an expense from the user's summaries"""
+    change_seq = bump_data_version(expense.user_id)
+    adjust_balance(expense.user_id, expense=sign * expense.amount, expense_count=sign)
+    adjust_rollup(
+        expense.user_id,
+        "expense",
+        month_start(expense.date),
+        expense.category_id,
+        sign * expense.amount,
+        sign,
+    )
+    if sign > 0:
+        expense.change_seq = change_seq
+        refresh_ledger("expense", expense.user_id, change_seq)
+    return change_seq
+
+
+class BulkChange:
+    """Balance and rollup deltas summed over many rows, applied in one go.
+
+    A write of any size then costs one balance update plus one rollup update
+    per (month, category) it touches.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.total = 0
+        self.count = 0
+        self.groups = {}
+
+    def add(self, rows, sign=1):
+        """Count inserted (sign=1) or deleted (sign=-1) rows, as dicts"""
+        for row in rows:
+            self.total += sign * row["amount"]
+            self.count += sign
+            key = (month_start(row["date"]), row.get("category_id", 0))
+            amount, rows_count = self.groups.get(key, (0, 0))
+            self.groups[key] = (amount + sign * row["amount"], rows_count + sign)
+
+    def apply(self, user_id):
+        if self.kind == "expense":
+            adjust_balance(user_id, expense=self.total, expense_count=self.count)
+        else:
+            adjust_balance(user_id, income=self.total, income_count=self.count)
+        for (month, category_id), (amount, rows_count) in self.groups.items():
+            if amount or rows_count:
+                adjust_rollup(user_id, self.kind, month, category_id, amount, rows_count)
+
+
+def record_bulk(kind, user_id, added=(), removed=()):
+    """Apply many inserted (`added`) and deleted (`removed`) rows, as dicts, at once.
+
+    An update is passed as its old values in `removed` and its new values in
+    `added`. Returns the change_seq the written rows should be stamped with;
+    once they are, pass it to refresh_ledger.
+    """
+    change_seq = bump_data_version(user_id)
+    change = BulkChange(kind)
+    change.add(added)
+    change.add(removed, sign=-1)
+    change.apply(user_id)
+    return change_seq
+
+
+def record_deletion(kind, user_id, row_ids, change_seq):
+    """Drop deleted rows from the ledger and leave tombstones for sync clients"""
+    db.session.execute(
+        delete(LedgerEntry).where(
+            LedgerEntry.kind == kind, LedgerEntry.source_id.in_(list(row_ids))
+        )
+    )
+    db.session.execute(
+        insert(Tombstone),
+        [
+            {"user_id": user_id, "kind": kind, "row_id": row_id, "change_seq": change_seq}
+            for row_id in row_ids
+        ],
+    )
+
+
+def ledger_source(kind):
+    """SELECT of one table's rows shaped as ledger_entry rows, and its model"""
+    if kind == "expense":
+        columns = (-Expense.amount, Expense.item, Expense.category_id)
+        model = Expense
+    else:
+        columns = (Income.amount, Income.note, null())
+        model = Income
+    amount, label, category_id = columns
+    return model, select(
+        literal_column(f"'{kind}'"), model.id, model.user_id, amount, model.date, label, category_id
+    )
+
+
+LEDGER_COLUMNS = ["kind", "source_id", "user_id", "amount", "date", "label", "category_id"]
+
+
+def refresh_ledger(kind, user_id, change_seq):
+    """Copy the user's rows stamped with `change_seq` into the ledger table"""
+    db.session.flush()
+    model, source = ledger_source(kind)
+    written = (model.user_id == user_id) & (model.change_seq == change_seq)
+    db.session.execute(
+        delete(LedgerEntry).where(
+            LedgerEntry.kind == kind,
+            LedgerEntry.source_id.in_(select(model.id).where(written)),
+        )
+    )
+    db.session.execute(insert(LedgerEntry).from_select(LEDGER_COLUMNS, source.where(written)))
+
+
+def rebuild_ledger(user_id=None):
+    """Replace ledger rows with fresh copies of the expense and income rows"""
+    purge = delete(LedgerEntry)
+    if user_id is not None:
+        purge = purge.where(LedgerEntry.user_id == user_id)
+    db.session.execute(purge)
+
+    for kind in ("expense", "income"):
+        model, source = ledger_source(kind)
+        if user_id is not None:
+            source = source.where(model.user_id == user_id)
+        db.session.execute(insert(LedgerEntry).from_select(LEDGER_COLUMNS, source))
+
+
+def balance_after(user_id, entry):
+    """Balance right after `entry`: the total minus everything dated after it"""
+    later = db.session.scalar(
+        select(func.coalesce(func.sum(LedgerEntry.amount), 0)).where(
+            LedgerEntry.user_id == user_id,
+            tuple_(LedgerEntry.date, LedgerEntry.id) > tuple_(entry.date, entry.id),
+        )
+    )
+    balance = get_balance(user_id)
+    return balance.total_income - balance.total_expense - later
+
+
+def cash_flow(query):
+    """Money in and out over the ledger rows of `query`, in one scan"""
+    subquery = query.with_entities(LedgerEntry.amount).subquery()
+    inflow, outflow = db.session.execute(
+        select(
+            func.coalesce(func.sum(case((subquery.c.amount > 0, subquery.c.amount), else_=0)), 0),
+            func.coalesce(func.sum(case((subquery.c.amount < 0, -subquery.c.amount), else_=0)), 0),
+        )
+    ).one()
+    return {"in": inflow, "out": outflow, "net": inflow - outflow}
+
+
+def _sum_rows(user_id, models):
+    """Total amount and row count over a live table and its archive"""
+    total = count = 0
+    for model in models:
+        amount, rows = db.session.query(
+            func.coalesce(func.sum(model.amount), 0), func.count(model.id)
+        ).filter(model.user_id == user_id).one()
+        total += amount
+        count += rows
+    return total, count
+
+
+def compute_balance(user_id):
+    """Build a fresh UserBalance for one user from the raw rows, archived ones included"""
+    total_income, income_count = _sum_rows(user_id, (Income, IncomeArchive))
+    total_expense, expense_count = _sum_rows(user_id, (Expense, ExpenseArchive))
+
+    return UserBalance(
+        user_id=user_id,
+        total_income=total_income,
+        total_expense=total_expense,
+        income_count=income_count,
+        expense_count=expense_count,
+    )
+
+
+def get_balance(user_id):
+    """Primary key lookup of the user's summary, built on first use"""
+    balance = db.session.get(UserBalance, user_id)
+    if balance is None:
+        balance = compute_balance(user_id)
+        db.session.add(balance)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another request built it first
+            db.session.rollback()
+            balance = db.session.get(UserBalance, user_id)
+    return balance
+
+
+def rebuild_rollups(user_id=None):
+    """Replace rollup rows with fresh GROUP BY results from the raw rows"""
+    purge = delete(MonthlyRollup)
+    if user_id is not None:
+        purge = purge.where(MonthlyRollup.user_id == user_id)
+    db.session.execute(purge)
+
+    # Archived rows count too, their summaries stay behind when they move
+    sources = (
+        ("expense", (Expense, ExpenseArchive)),
+        ("income", (Income, IncomeArchive)),
+    )
+    for kind, models in sources:
+        parts = []
+        for model in models:
+            category = model.category_id if kind == "expense" else literal_column("0")
+            part = select(
+                model.user_id, model.date, model.amount, category.label("category_id")
+            ).where(model.date.isnot(None))
+            if user_id is not None:
+                part = part.where(model.user_id == user_id)
+            parts.append(part)
+        rows = union_all(*parts).subquery()
+
+        month = month_expr(rows.c.date)
+        grouped = select(
+            rows.c.user_id,
+            literal_column(f"'{kind}'"),
+            month,
+            rows.c.category_id,
+            func.sum(rows.c.amount),
+            func.count(),
+        ).group_by(rows.c.user_id, month, rows.c.category_id)
+
+        db.session.execute(
+            insert(MonthlyRollup).from_select(
+                ["user_id", "kind", "month", "category_id", "total", "count"], grouped
+            )
+        )
+
+
+def monthly_report(user_id, months=12):
+    """Income and spending by month and category, read only from the rollups"""
+    now = datetime.now()
+    first = now.year * 12 + now.month - 1 - (months - 1)
+    since = date(first // 12, first % 12 + 1, 1)
+
+    rows = db.session.execute(
+        select(
+            MonthlyRollup.kind,
+            MonthlyRollup.month,
+            Category.name,
+            MonthlyRollup.total,
+        )
+        .outerjoin(Category, Category.id == MonthlyRollup.category_id)
+        .where(
+            MonthlyRollup.user_id == user_id,
+            MonthlyRollup.month >= since,
+            MonthlyRollup.count > 0,
+        )
+        .order_by(MonthlyRollup.month)
+    ).all()
+
+    by_month = {}
+    categories = set()
+    for kind, month, category, total in rows:
+        entry = by_month.setdefault(
+            month, {"month": month.strftime("%Y-%m"), "income": 0, "expense": 0, "categories": {}}
+        )
+        entry[kind] += total
+        if kind == "expense":
+            entry["categories"][category] = total
+            categories.add(category)
+
+    return {"months": list(by_month.values()), "categories": sorted(categories)}
@@ -0,0 +1,125 @@
+from flask import Response, abort, current_app, g, has_request_context, request
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy import event
+import hmac
+import time
+import os
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        CollectorRegistry,
+        Histogram,
+        generate_latest,
+        multiprocess,
+    )
+except ImportError:  # metrics are optional, /metrics is not registered without them
+    Histogram = None
+
+if Histogram is not None:
+    # With PROMETHEUS_MULTIPROC_DIR set these are written to per-worker files
+    # that /metrics merges, so every gunicorn worker is counted
+    REQUEST_LATENCY = Histogram(
+        "trackly_request_latency_seconds",
+        "Time spent handling a request.",
+        ["endpoint", "method"],
+    )
+    REQUEST_QUERIES = Histogram(
+        "trackly_request_sql_queries",
+        "SQL statements issued per request.",
+        ["endpoint"],
+        buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, float("inf")),
+    )
+    REQUEST_QUERY_TIME = Histogram(
+        "trackly_request_sql_seconds",
+        "Time spent in SQL per request.",
+        ["endpoint"],
+    )
+    POOL_CHECKOUT_WAIT = Histogram(
+        "trackly_db_pool_checkout_wait_seconds",
+        "Time spent waiting for a pooled database connection.",
+        buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30, float("inf")),
+    )
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "metrics_started" in g:
+        g.metrics_queries += 1
+        g.metrics_query_time += time.perf_counter() - context.metrics_started
+
+
+if Histogram is not None:
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class Metrics:
+    """Per-endpoint latency and SQL metrics, served at /metrics for Prometheus.
+
+    Must be initialised before the database so the pool can be swapped for a
+    timed one.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if Histogram is None or not app.config.get("METRICS_ENABLED", True):
+            return
+
+        options = app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {})
+        url = make_url(app.config.get("SQLALCHEMY_DATABASE_URI") or "sqlite://")
+        in_memory = url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+        if "poolclass" not in options and not in_memory:
+            app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {**options, "poolclass": TimedQueuePool}
+
+        app.before_request(self._start_request)
+        app.teardown_request(self._finish_request)
+        app.add_url_rule("/metrics", "metrics", self._metrics_view)
+        app.extensions["metrics"] = self
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_query_time = 0.0
+
+    def _finish_request(self, exc):
+        if "metrics_started" not in g:
+            return
+        endpoint = request.endpoint or "unknown"
+        REQUEST_LATENCY.labels(endpoint, request.method).observe(
+            time.perf_counter() - g.metrics_started
+        )
+        REQUEST_QUERIES.labels(endpoint).observe(g.metrics_queries)
+        REQUEST_QUERY_TIME.labels(endpoint).observe(g.metrics_query_time)
+
+    def _metrics_view(self):
+        # Route and SQL timings are not for the public, without a token there is no endpoint
+        token = current_app.config.get("METRICS_TOKEN")
+        if not token:
+            abort(404)
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            abort(403)
+
+        if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+        return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
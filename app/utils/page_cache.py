@@ -0,0 +1,128 @@
+from flask import current_app, make_response, request, session
+from werkzeug.utils import import_string
+from flask_login import current_user
+from collections import OrderedDict
+from sqlalchemy import select
+from functools import wraps
+import threading
+import hashlib
+
+
+class LRUCacheBackend:
+    """In-process cache evicting the least recently used pages past `max_bytes`"""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes // 4:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def delete(self, key):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+
+
+class NullCacheBackend:
+    """Stores nothing, ETags and 304s still work"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, key):
+        pass
+
+
+class PageCache:
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get("PAGE_CACHE_BACKEND", "lru")
+        if backend == "lru":
+            self.backend = LRUCacheBackend(app.config.get("PAGE_CACHE_MAX_BYTES"))
+        elif backend == "null":
+            self.backend = NullCacheBackend()
+        else:
+            # Dotted path to any class with get/set/delete, e.g. a shared store
+            self.backend = import_string(backend)(app)
+        app.extensions["page_cache"] = self
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value):
+        self.backend.set(key, value)
+
+
+def current_data_version(user_id):
+    """The user's data version as committed, not the user cache's copy, which
+    other worker processes only drop once it expires"""
+    from app.models import Signup
+    from app import db
+
+    return db.session.scalar(select(Signup.data_version).where(Signup.id == user_id))
+
+
+def page_etag(user):
+    """ETag for the current page as `user` sees it at their current data version"""
+    salt = current_app.config.get("PAGE_CACHE_SALT", "")
+    raw = f"{salt}:{user.id}:{current_data_version(user.id)}:{request.full_path}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def cached_page(view):
+    """Serve a per-user page from cache (or as a 304) until the user's data changes"""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Pages carrying one-off flash messages must be rendered fresh
+        if not current_user.is_authenticated or session.get("_flashes"):
+            return view(*args, **kwargs)
+
+        cache = current_app.extensions["page_cache"]
+        etag = page_etag(current_user)
+
+        if etag in request.if_none_match:
+            response = current_app.response_class(status=304)
+        else:
+            body = cache.get(etag)
+            if body is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                cache.set(etag, response.get_data())
+            else:
+                response = current_app.response_class(body, mimetype="text/html")
+
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    return wrapper
@@ -0,0 +1,107 @@
+from flask import request, url_for
+from datetime import datetime
+from sqlalchemy import tuple_
+import binascii
+import base64
+
+PER_PAGE_OPTIONS = (10, 25, 50, 100)
+DEFAULT_PER_PAGE = 25
+CURSOR_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+def encode_cursor(date: datetime, row_id: int):
+    """Encode a (date, id) position into an opaque url-safe token"""
+    raw = f"{date.strftime(CURSOR_DATE_FORMAT)}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str):
+    """Decode a cursor token back to (date, id), None if it is missing or malformed"""
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        date_str, row_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.strptime(date_str, CURSOR_DATE_FORMAT), int(row_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return None
+
+
+def get_per_page(value):
+    """Clamp the requested page size to one of the allowed options"""
+    try:
+        per_page = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PER_PAGE
+    return per_page if per_page in PER_PAGE_OPTIONS else DEFAULT_PER_PAGE
+
+
+def page_url(**changes):
+    """Build a url to the current page keeping its query string, minus old cursors.
+
+    A change of None keeps the current value, False drops it.
+    """
+    args = request.args.to_dict()
+    args.pop("after", None)
+    args.pop("before", None)
+    for key, value in changes.items():
+        if value is False:
+            args.pop(key, None)
+        elif value is not None:
+            args[key] = value
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+
+class KeysetPage:
+    per_page_options = PER_PAGE_OPTIONS
+    # "archived" value for the links, when one crosses between live and archived rows
+    next_archived = prev_archived = None
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def keyset_paginate(query, model, after=None, before=None, per_page=DEFAULT_PER_PAGE):
+    """Return one page of `query` ordered newest first on (date, id).
+
+    `after` / `before` are decoded cursors. Only `per_page + 1` rows are read,
+    so every page costs the same no matter how deep into the history it is.
+    """
+    key = tuple_(model.date, model.id)
+
+    if before:
+        # Walk backwards from the cursor, then flip back to newest first
+        rows = (
+            query.filter(key > tuple_(*before))
+            .order_by(model.date.asc(), model.id.asc())
+            .limit(per_page + 1)
+            .all()
+        )
+        if rows:
+            has_prev = len(rows) > per_page
+            items = list(reversed(rows[:per_page]))
+            return _build_page(items, per_page, has_next=True, has_prev=has_prev)
+        # Nothing newer than the cursor anymore, show the first page instead
+        after = None
+
+    if after:
+        query = query.filter(key < tuple_(*after))
+    rows = (
+        query.order_by(model.date.desc(), model.id.desc()).limit(per_page + 1).all()
+    )
+    has_next = len(rows) > per_page
+    return _build_page(
+        rows[:per_page], per_page, has_next=has_next, has_prev=after is not None
+    )
+
+
+def _build_page(items, per_page, has_next, has_prev):
+    next_cursor = prev_cursor = None
+    if items and has_next:
+        next_cursor = encode_cursor(items[-1].date, items[-1].id)
+    if items and has_prev:
+        prev_cursor = encode_cursor(items[0].date, items[0].id)
+    return KeysetPage(items, per_page, next_cursor, prev_cursor)
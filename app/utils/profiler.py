@@ -0,0 +1,83 @@
+from flask import current_app, g, request
+from flask_login import current_user
+from datetime import datetime
+import cProfile
+import logging
+import random
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class RequestProfiler:
+    """Opt-in cProfile of single requests.
+
+    A request is profiled when it carries PROFILER_TOKEN in the X-Profile
+    header or the `_profile` query argument, or when it falls in the sampled
+    PROFILER_SAMPLE_RATE fraction of traffic. Each profile is written as a
+    pstats `.prof` file (open with snakeviz, or turn into a flamegraph with
+    flameprof) named after the endpoint and user, and only the newest
+    PROFILER_MAX_FILES are kept.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get("PROFILER_ENABLED", False):
+            return
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.extensions["profiler"] = self
+
+    def _wants_profile(self):
+        token = current_app.config.get("PROFILER_TOKEN")
+        if token and token in (request.headers.get("X-Profile"), request.args.get("_profile")):
+            return True
+        return random.random() < current_app.config.get("PROFILER_SAMPLE_RATE", 0.0)
+
+    def _start_request(self):
+        if not self._wants_profile():
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another request on this interpreter is already being profiled
+            return
+        g.profile = profile
+        g.profile_started = time.perf_counter()
+
+    def _finish_request(self, response):
+        profile = g.pop("profile", None)
+        if profile is None:
+            return response
+        profile.disable()
+
+        elapsed_ms = (time.perf_counter() - g.profile_started) * 1000
+        user_id = current_user.get_id() if current_user.is_authenticated else "anon"
+        endpoint = (request.endpoint or "unknown").replace(".", "-")
+        filename = (
+            f"{datetime.now():%Y%m%d-%H%M%S-%f}_{endpoint}_user-{user_id}_{elapsed_ms:.0f}ms.prof"
+        )
+
+        directory = current_app.config.get("PROFILER_DIR") or os.path.join(
+            current_app.instance_path, "profiles"
+        )
+        try:
+            os.makedirs(directory, exist_ok=True)
+            profile.dump_stats(os.path.join(directory, filename))
+            self._rotate(directory, current_app.config.get("PROFILER_MAX_FILES", 200))
+        except OSError:
+            logger.exception("Could not write profile %s", filename)
+        return response
+
+    def _rotate(self, directory, keep):
+        profiles = sorted(name for name in os.listdir(directory) if name.endswith(".prof"))
+        for name in profiles[: max(len(profiles) - keep, 0)]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
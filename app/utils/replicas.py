@@ -0,0 +1,141 @@
+from flask import current_app, has_request_context, request, session as flask_session
+from app.utils.shards import shard_bind_key, touches_shard
+from flask_sqlalchemy.session import Session
+from sqlalchemy.exc import OperationalError
+from functools import wraps
+from sqlalchemy import event
+import itertools
+import threading
+import time
+
+
+class RoutingSession(Session):
+    """Session that sends per-user tables to the user's shard, and reads the
+    rest from the replica picked for the request, if any.
+
+    Flushes, INSERT/UPDATE/DELETE statements and everything after the
+    session's first write go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        shard = shard_bind_key(self.info.get("shard"))
+        if shard is not None and bind is None and touches_shard(mapper, clause):
+            return self._db.engines[shard]
+
+        replica = self.info.get("replica")
+        if (
+            replica is not None
+            and bind is None
+            and not self._flushing
+            and not self.info.get("wrote")
+            and not getattr(clause, "is_dml", False)
+        ):
+            return self._db.engines[replica]
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _note_write(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _note_bulk_write(orm_execute_state):
+    # session.execute(insert()/update()/delete()) writes without a flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _stick_to_primary(session):
+    if not session.info.pop("wrote", False):
+        return
+    # The replicas may not have this write yet: read it back from the primary
+    # for the rest of the request, and for a while on the user's next ones
+    session.info.pop("replica", None)
+    if has_request_context():
+        flask_session["db_wrote_at"] = time.time()
+
+
+class ReplicaRouter:
+    """Round-robin choice of read replicas for views marked with @use_replica.
+
+    Must be initialised before the database, as it adds a bind per replica.
+    A replica that fails is skipped for REPLICA_RETRY_AFTER seconds and the
+    view is served from the primary instead.
+    """
+
+    def __init__(self, app=None, db=None):
+        self.db = db
+        self.bind_keys = []
+        self.sticky_seconds = 5
+        self.retry_after = 30
+        self._cycle = None
+        self._down_until = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db=None):
+        if db is not None:
+            self.db = db
+        self.sticky_seconds = app.config.get("REPLICA_STICKY_SECONDS", 5)
+        self.retry_after = app.config.get("REPLICA_RETRY_AFTER", 30)
+        urls = app.config.get("SQLALCHEMY_REPLICA_URLS") or []
+
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        self.bind_keys = []
+        for index, url in enumerate(urls):
+            key = f"replica_{index}"
+            binds[key] = url
+            self.bind_keys.append(key)
+        app.config["SQLALCHEMY_BINDS"] = binds
+        self._cycle = itertools.cycle(self.bind_keys)
+        app.extensions["replicas"] = self
+
+    def choose(self):
+        """Next healthy replica's bind key, None when all are down or none are set"""
+        now = time.monotonic()
+        with self._lock:
+            for _ in self.bind_keys:
+                key = next(self._cycle)
+                if self._down_until.get(key, 0) <= now:
+                    return key
+        return None
+
+    def mark_down(self, key):
+        with self._lock:
+            self._down_until[key] = time.monotonic() + self.retry_after
+
+    def wrote_recently(self):
+        return flask_session.get("db_wrote_at", 0) > time.time() - self.sticky_seconds
+
+
+def use_replica(view):
+    """Serve the view's GET requests from a read replica when one is configured"""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        router = current_app.extensions.get("replicas")
+        if router is None or request.method not in ("GET", "HEAD") or router.wrote_recently():
+            return view(*args, **kwargs)
+        key = router.choose()
+        if key is None:
+            return view(*args, **kwargs)
+
+        session = router.db.session
+        session.info["replica"] = key
+        try:
+            return view(*args, **kwargs)
+        except OperationalError:
+            if session.info.get("replica") != key:
+                raise  # failed on the primary after a write
+            current_app.logger.warning("Replica %s failed, reading from the primary", key)
+            router.mark_down(key)
+            session.rollback()
+            session.info.pop("replica", None)
+            return view(*args, **kwargs)
+        finally:
+            session.info.pop("replica", None)
+
+    return wrapper
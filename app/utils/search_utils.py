@@ -0,0 +1,151 @@
+from sqlalchemy import column, event, false, func, literal_column, or_, select, table, text
+from app.utils.pagination import PER_PAGE_OPTIONS
+from app.models import Category, Expense, Income
+from app import db
+import re
+
+MAX_TERMS = 8
+WORD_RE = re.compile(r"\w+")
+
+# kind -> (model, indexed fields, SQL reading them from a `{row}` of the table,
+#          columns of the table they depend on)
+SEARCH_FIELDS = {
+    "expense": (
+        Expense,
+        ("item", "category"),
+        "{row}.item, (SELECT name FROM category WHERE id = {row}.category_id)",
+        ("item", "category_id"),
+    ),
+    "income": (Income, ("note",), "{row}.note", ("note",)),
+}
+
+# SQLite: FTS5 tables holding their own copy of the text, which lets the
+# category name be copied in; triggers keep them in step with the ledger
+SQLITE_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS {kind}_fts USING fts5({fields})",
+    "CREATE TRIGGER IF NOT EXISTS {kind}_fts_ai AFTER INSERT ON {kind} BEGIN"
+    " INSERT INTO {kind}_fts(rowid, {fields}) VALUES (new.id, {new_values}); END",
+    "CREATE TRIGGER IF NOT EXISTS {kind}_fts_ad AFTER DELETE ON {kind} BEGIN"
+    " DELETE FROM {kind}_fts WHERE rowid = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS {kind}_fts_au AFTER UPDATE OF {columns} ON {kind} BEGIN"
+    " DELETE FROM {kind}_fts WHERE rowid = old.id;"
+    " INSERT INTO {kind}_fts(rowid, {fields}) VALUES (new.id, {new_values}); END",
+)
+
+# PostgreSQL: GIN expression indexes over each table's own text, used by
+# queries repeating the same expression; category names are matched apart
+POSTGRES_SEARCH_COLUMNS = {"expense": "item", "income": "note", "category": "name"}
+POSTGRES_SEARCH_DDL = "CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} USING GIN ({vector})"
+
+
+def search_vector(table_name):
+    """tsvector expression over the table's searched column, exactly as in its GIN index"""
+    return f"to_tsvector('simple', coalesce({POSTGRES_SEARCH_COLUMNS[table_name]}, ''))"
+
+
+def search_ddl(dialect):
+    """Statements creating the search indexes, empty if `dialect` has none"""
+    if dialect == "postgresql":
+        return [
+            POSTGRES_SEARCH_DDL.format(table=table_name, vector=search_vector(table_name))
+            for table_name in POSTGRES_SEARCH_COLUMNS
+        ]
+    if dialect != "sqlite":
+        return []
+    statements = []
+    for kind, (_, fields, values, columns) in SEARCH_FIELDS.items():
+        statements += [
+            statement.format(
+                kind=kind,
+                fields=", ".join(fields),
+                new_values=values.format(row="new"),
+                columns=", ".join(columns),
+            )
+            for statement in SQLITE_SEARCH_DDL
+        ]
+    return statements
+
+
+@event.listens_for(db.metadata, "after_create")
+def install_search(target, connection, **kw):
+    """Create the search indexes along with the tables in db.create_all()"""
+    for statement in search_ddl(connection.dialect.name):
+        connection.exec_driver_sql(statement)
+
+
+def search_terms(q):
+    return [term.lower() for term in WORD_RE.findall(q or "")][:MAX_TERMS]
+
+
+def search_query(kind, user_id, q):
+    """The user's rows matching every word of `q` as a prefix, best match first"""
+    model, fields, _, _ = SEARCH_FIELDS[kind]
+    terms = search_terms(q)
+    query = model.query.filter(model.user_id == user_id)
+    if not terms:
+        return query.filter(false())
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "sqlite":
+        fts = table(f"{kind}_fts", column("rowid"))
+        match = " ".join(f'"{term}"*' for term in terms)
+        return (
+            query.join(fts, fts.c.rowid == model.id)
+            .filter(text(f"{kind}_fts MATCH :match").bindparams(match=match))
+            .order_by(text(f"bm25({kind}_fts)"), model.date.desc(), model.id.desc())
+        )
+    if dialect == "postgresql":
+        vector = literal_column(search_vector(kind))
+        tsquery = func.to_tsquery(
+            literal_column("'simple'"), " & ".join(f"{term}:*" for term in terms)
+        )
+        matches = vector.op("@@")(tsquery)
+        if model is Expense:
+            # Rows whose category name matches, through the small category table
+            matches = or_(
+                matches,
+                model.category_id.in_(
+                    select(Category.id).where(
+                        Category.user_id == user_id,
+                        literal_column(search_vector("category")).op("@@")(tsquery),
+                    )
+                ),
+            )
+        return query.filter(matches).order_by(
+            func.ts_rank(vector, tsquery).desc(), model.date.desc(), model.id.desc()
+        )
+
+    # No full-text index on other databases, scan the user's rows instead
+    if model is Expense:
+        query = query.join(Category, Category.id == model.category_id)
+    searched = [Category.name if name == "category" else getattr(model, name) for name in fields]
+    for term in terms:
+        query = query.filter(or_(*(field.ilike(f"%{term}%") for field in searched)))
+    return query.order_by(model.date.desc(), model.id.desc())
+
+
+class RankedPage:
+    """One page of ranked results, shaped like KeysetPage for _pagination.html.
+
+    Rank order has no stable key to seek on, so the cursors here are plain
+    offsets, each pointing at the first row of the page it leads to.
+    """
+
+    per_page_options = PER_PAGE_OPTIONS
+    next_archived = prev_archived = None
+
+    def __init__(self, items, per_page, offset, has_next):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = str(offset + per_page) if has_next else None
+        self.prev_cursor = str(max(offset - per_page, 0)) if offset else None
+
+
+def search_paginate(query, cursor, per_page):
+    """Return the RankedPage of `query` starting at the offset in `cursor`"""
+    try:
+        offset = max(int(cursor or 0), 0)
+    except ValueError:
+        offset = 0
+    rows = query.offset(offset).limit(per_page + 1).all()
+    return RankedPage(rows[:per_page], per_page, offset, has_next=len(rows) > per_page)
@@ -0,0 +1,88 @@
+from app.utils.ledger_utils import compute_balance, rebuild_ledger, rebuild_rollups
+from app.utils.category_utils import DEFAULT_CATEGORIES, resolve_categories
+from werkzeug.security import generate_password_hash
+from app.models import Expense, Income, Signup
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select
+from app import db, shards
+import random
+
+SEED_PASSWORD = "password"
+SEED_ITEMS = ("Coffee", "Bus ticket", "Rent", "Pharmacy", "Cinema", "Books", "Gift", "Lunch")
+SEED_NOTES = ("Salary", "Freelance", "Refund", "Bonus", "Interest")
+
+
+def seed_email(index):
+    return f"seed-user-{index}@example.com"
+
+
+def seed_data(users, rows, seed=42, batch_size=5000):
+    """Create `users` accounts with `rows` expenses and `rows` incomes each.
+
+    Output is fully determined by `seed`. Rows go in as batched executemany
+    inserts and the summaries are rebuilt once at the end. Returns the new user ids.
+    """
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    span_minutes = int((datetime(2026, 1, 1) - start).total_seconds() // 60)
+    # Hashing is deliberately slow, every seeded user shares one hash
+    password = generate_password_hash(SEED_PASSWORD)
+
+    offset = (db.session.query(db.func.max(Signup.id)).scalar() or 0) + 1
+    db.session.execute(
+        insert(Signup),
+        [
+            {
+                "name": f"Seed User {offset + i}",
+                "email": seed_email(offset + i),
+                "password": password,
+                "country": "Pakistan",
+                "timezone": "Asia/Karachi",
+            }
+            for i in range(users)
+        ],
+    )
+    emails = [seed_email(offset + i) for i in range(users)]
+    user_ids = db.session.scalars(select(Signup.id).where(Signup.email.in_(emails))).all()
+    placed = shards.place(user_ids)
+
+    def random_date():
+        return start + timedelta(minutes=rng.randrange(span_minutes))
+
+    for user_id in user_ids:
+        shards.use(placed[user_id])
+        ids = resolve_categories(user_id, DEFAULT_CATEGORIES)
+        category_ids = [ids[name] for name in DEFAULT_CATEGORIES]
+        expenses, incomes = [], []
+        for _ in range(rows):
+            expenses.append(
+                {
+                    "user_id": user_id,
+                    "item": rng.choice(SEED_ITEMS),
+                    "category_id": rng.choice(category_ids),
+                    "amount": rng.randint(50, 20000),
+                    "date": random_date(),
+                }
+            )
+            incomes.append(
+                {
+                    "user_id": user_id,
+                    "amount": rng.randint(1000, 200000),
+                    "note": rng.choice(SEED_NOTES),
+                    "date": random_date(),
+                }
+            )
+            if len(expenses) >= batch_size:
+                db.session.execute(insert(Expense), expenses)
+                db.session.execute(insert(Income), incomes)
+                expenses, incomes = [], []
+        if expenses:
+            db.session.execute(insert(Expense), expenses)
+            db.session.execute(insert(Income), incomes)
+
+        db.session.merge(compute_balance(user_id))
+        rebuild_rollups(user_id)
+        rebuild_ledger(user_id)
+
+    db.session.commit()
+    return user_ids
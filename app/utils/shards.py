@@ -0,0 +1,326 @@
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.sql.util import find_tables
+import time
+
+# Per-user tables, stored on the user's shard. Signup and anything else stay
+# in the directory database, which is also shard 0
+SHARDED_TABLES = frozenset(
+    {
+        "category",
+        "expense",
+        "income",
+        "expense_archive",
+        "income_archive",
+        "user_balance",
+        "monthly_rollup",
+        "tombstone",
+        "ledger_entry",
+    }
+)
+# Children before parents, the order a user's rows are deleted in
+PURGE_ORDER = (
+    "ledger_entry",
+    "tombstone",
+    "monthly_rollup",
+    "user_balance",
+    "expense",
+    "income",
+    "expense_archive",
+    "income_archive",
+    "category",
+)
+
+# (live table, table its rows are read from) when moving a user
+COPY_SOURCES = (
+    ("expense", "expense"),
+    ("expense", "expense_archive"),
+    ("income", "income"),
+    ("income", "income_archive"),
+)
+
+
+class ShardMovedError(Exception):
+    """The user was moved to another shard while this transaction was writing"""
+
+
+def shard_bind_key(shard):
+    """Bind key of a shard, None for shard 0 as it is the directory database"""
+    return f"shard_{shard}" if shard else None
+
+
+def touches_shard(mapper=None, clause=None):
+    """True when a statement reads or writes one of the per-user tables"""
+    if mapper is not None:
+        return mapper.local_table.name in SHARDED_TABLES
+    if clause is not None:
+        return any(table.name in SHARDED_TABLES for table in find_tables(clause, include_crud=True))
+    return False
+
+
+class ShardRouter:
+    """Maps each user to the database holding their ledger rows.
+
+    Signup is the directory: its `shard` column says where the user's rows
+    live. Shard 0 is the primary database, SQLALCHEMY_SHARD_URLS add shards
+    1..N as binds, so it must be initialised before the database. Shards keep
+    a copy of their users' signup rows for the foreign keys to point at.
+    """
+
+    def __init__(self, app=None, db=None):
+        self.db = db
+        self.count = 1
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db=None):
+        if db is not None:
+            self.db = db
+        urls = app.config.get("SQLALCHEMY_SHARD_URLS") or []
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        for shard, url in enumerate(urls, start=1):
+            binds[shard_bind_key(shard)] = url
+        app.config["SQLALCHEMY_BINDS"] = binds
+        self.count = len(urls) + 1
+        app.extensions["shards"] = self
+
+    def engine(self, shard):
+        return self.db.engines[shard_bind_key(shard)]
+
+    def use(self, shard):
+        """Send the session's per-user statements to `shard`"""
+        self.db.session.info["shard"] = shard
+
+    def use_user(self, user_id):
+        """Look up the user's shard in the directory and use it, returns the shard"""
+        from app.models import Signup
+
+        if self.count == 1:
+            self.use(0)
+            return 0
+        # From the primary, a replica may not have seen a move yet
+        shard = self.db.session.scalar(
+            select(Signup.shard).where(Signup.id == user_id),
+            bind_arguments={"bind": self.engine(0)},
+        ) or 0
+        self.use(shard)
+        return shard
+
+    def user_counts(self, exclude=()):
+        from app.models import Signup
+
+        query = select(Signup.shard, func.count()).group_by(Signup.shard)
+        if exclude:
+            query = query.where(Signup.id.not_in(list(exclude)))
+        return dict(self.db.session.execute(query).all())
+
+    def place(self, user_ids):
+        """Spread new users over the least populated shards, returns {user_id: shard}.
+
+        Runs in the caller's transaction, which also copies the signup rows
+        to their shards.
+        """
+        from app.models import Signup
+
+        if self.count == 1:
+            return {user_id: 0 for user_id in user_ids}
+        counts = self.user_counts(exclude=user_ids)
+        placed = {}
+        for user_id in user_ids:
+            shard = min(range(self.count), key=lambda s: counts.get(s, 0))
+            counts[shard] = counts.get(shard, 0) + 1
+            placed[user_id] = shard
+
+        signup = Signup.__table__
+        for shard in set(placed.values()) - {0}:
+            ids = [user_id for user_id, s in placed.items() if s == shard]
+            self.db.session.execute(update(Signup).where(Signup.id.in_(ids)).values(shard=shard))
+            rows = self.db.session.execute(select(signup).where(signup.c.id.in_(ids))).mappings().all()
+            connection = self.db.session.connection(bind_arguments={"bind": self.engine(shard)})
+            connection.execute(insert(signup), [dict(row) for row in rows])
+        return placed
+
+    def purge_user(self, user_id, shard, batch_size=1000, pause=0, progress=None):
+        """Delete the user's rows from `shard`, committing every `batch_size` rows.
+
+        Sleeps `pause` seconds between batches and calls `progress(table,
+        deleted)` after each. The directory's signup row is left alone.
+        Returns the rows deleted.
+        """
+        tables = self.db.metadata.tables
+        engine = self.engine(shard)
+        deleted = 0
+        for name in PURGE_ORDER:
+            table = tables[name]
+            if "id" not in table.c:
+                # At most a row per month, deleted in one go
+                with engine.begin() as connection:
+                    deleted += connection.execute(
+                        delete(table).where(table.c.user_id == user_id)
+                    ).rowcount
+                if progress:
+                    progress(name, deleted)
+                continue
+            while True:
+                batch = select(table.c.id).where(table.c.user_id == user_id).limit(batch_size)
+                with engine.begin() as connection:
+                    count = connection.execute(delete(table).where(table.c.id.in_(batch))).rowcount
+                deleted += count
+                if progress:
+                    progress(name, deleted)
+                if count < batch_size:
+                    break
+                if pause:
+                    time.sleep(pause)
+        if shard:
+            signup = tables["signup"]
+            with engine.begin() as connection:
+                connection.execute(delete(signup).where(signup.c.id == user_id))
+        return deleted
+
+    def copy_user(self, user_id, source, target, change_seq, batch_size=1000):
+        """Copy the user's rows from `source` to `target` with fresh ids.
+
+        Copied rows get `change_seq`, and their old ids are tombstoned with it,
+        so sync clients swap their copies once the user points at `target`.
+        Archived rows land in the live tables, to be archived again there.
+        """
+        from app.utils.ledger_utils import LEDGER_COLUMNS, ledger_source
+
+        tables = self.db.metadata.tables
+        signup, category, tombstone = tables["signup"], tables["category"], tables["tombstone"]
+        rollup, balance = tables["monthly_rollup"], tables["user_balance"]
+        source_engine, target_engine = self.engine(source), self.engine(target)
+
+        if target:
+            with self.engine(0).connect() as directory:
+                row = directory.execute(select(signup).where(signup.c.id == user_id)).mappings().one()
+            with target_engine.begin() as connection:
+                connection.execute(insert(signup), [dict(row)])
+
+        with source_engine.connect() as connection:
+            categories = {}
+            rows = connection.execute(select(category).where(category.c.user_id == user_id)).mappings()
+            with target_engine.begin() as copy:
+                for row in rows:
+                    created = copy.execute(insert(category).values(user_id=user_id, name=row["name"]))
+                    categories[row["id"]] = created.inserted_primary_key[0]
+
+            for kind, source_name in COPY_SOURCES:
+                table, source_table = tables[kind], tables[source_name]
+                last_id = 0
+                while True:
+                    rows = connection.execute(
+                        select(source_table)
+                        .where(source_table.c.user_id == user_id, source_table.c.id > last_id)
+                        .order_by(source_table.c.id)
+                        .limit(batch_size)
+                    ).mappings().all()
+                    if not rows:
+                        break
+                    last_id = rows[-1]["id"]
+                    copies = []
+                    for row in rows:
+                        values = {**row, "change_seq": change_seq}
+                        del values["id"]
+                        if kind == "expense":
+                            values["category_id"] = categories[row["category_id"]]
+                        copies.append(values)
+                    with target_engine.begin() as copy:
+                        copy.execute(insert(table), copies)
+                        copy.execute(
+                            insert(tombstone),
+                            [
+                                {
+                                    "user_id": user_id,
+                                    "kind": kind,
+                                    "row_id": row["id"],
+                                    "change_seq": change_seq,
+                                }
+                                for row in rows
+                            ],
+                        )
+
+            # Earlier tombstones still name ids clients may hold; summaries copy over as they are
+            old_tombstones = connection.execute(
+                select(tombstone).where(tombstone.c.user_id == user_id)
+            ).mappings().all()
+            rollups = connection.execute(
+                select(rollup).where(rollup.c.user_id == user_id)
+            ).mappings().all()
+            balances = connection.execute(
+                select(balance).where(balance.c.user_id == user_id)
+            ).mappings().all()
+
+        with target_engine.begin() as copy:
+            if old_tombstones:
+                copy.execute(
+                    insert(tombstone),
+                    [{key: value for key, value in row.items() if key != "id"}
+                     for row in old_tombstones],
+                )
+            if rollups:
+                copy.execute(
+                    insert(rollup),
+                    [{**row, "category_id": categories.get(row["category_id"], 0)}
+                     for row in rollups],
+                )
+            if balances:
+                copy.execute(insert(balance), [dict(row) for row in balances])
+            for kind in ("expense", "income"):
+                model, ledger_rows = ledger_source(kind)
+                copy.execute(
+                    insert(tables["ledger_entry"]).from_select(
+                        LEDGER_COLUMNS, ledger_rows.where(model.user_id == user_id)
+                    )
+                )
+
+    def move_user(self, user_id, target, batch_size=1000, grace=5, retries=3, echo=None):
+        """Move a user's rows to `target` while they keep using the app.
+
+        The rows are copied, then the directory is pointed at `target` only if
+        the user's data_version did not change meanwhile; otherwise the copy
+        is dropped and retried. Writers still routed to the old shard fail
+        their data_version bump with ShardMovedError, so nothing is lost.
+        The old rows are purged `grace` seconds later, once in-flight
+        requests are done with them.
+        """
+        from app.models import Signup
+        from app import user_cache
+
+        echo = echo or (lambda message: None)
+        session = self.db.session
+        source = session.scalar(select(Signup.shard).where(Signup.id == user_id))
+        if source is None:
+            raise ValueError(f"No user {user_id}.")
+        if source == target:
+            return False
+        if not 0 <= target < self.count:
+            raise ValueError(f"No shard {target}, there are {self.count}.")
+
+        for attempt in range(1, retries + 1):
+            version = session.scalar(select(Signup.data_version).where(Signup.id == user_id))
+            session.rollback()
+            # Let transactions that bumped the version finish their shard writes
+            time.sleep(grace)
+            echo(f"Copying user {user_id} from shard {source} to {target} (attempt {attempt})")
+            self.copy_user(user_id, source, target, version + 1, batch_size)
+
+            flipped = session.execute(
+                update(Signup)
+                .where(Signup.id == user_id, Signup.shard == source, Signup.data_version == version)
+                .values(shard=target, data_version=version + 1)
+            ).rowcount
+            if flipped:
+                user_cache.invalidate(session, user_id)
+                session.commit()
+                break
+            session.rollback()
+            echo("The user wrote during the copy, starting over")
+            self.purge_user(user_id, target, batch_size)
+        else:
+            raise RuntimeError(f"User {user_id} kept writing, gave up after {retries} attempts.")
+
+        time.sleep(grace)
+        echo(f"Purging user {user_id} from shard {source}")
+        self.purge_user(user_id, source, batch_size)
+        return True
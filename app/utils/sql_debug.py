@@ -0,0 +1,117 @@
+from flask import current_app, g, has_request_context, render_template, request
+from sqlalchemy.engine import Engine
+from sqlalchemy import event
+from collections import Counter
+import logging
+import time
+import json
+
+logger = logging.getLogger("trackly.sql_debug")
+
+PANEL_MARKER = b"<!-- sql-debug-panel -->"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.sql_debug_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context() or "sql_debug" not in g or conn.info.get("sql_debug_explain"):
+        return
+    g.sql_debug.append(
+        {
+            "statement": statement,
+            "parameters": parameters,
+            "executemany": executemany,
+            "engine": conn.engine,  # shard or replica the statement ran on
+            "duration_ms": (time.perf_counter() - context.sql_debug_started) * 1000,
+        }
+    )
+
+
+def explain(engine, statement, parameters):
+    """EXPLAIN one captured statement on a side connection, returns plan lines"""
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    with engine.connect() as connection:
+        connection.info["sql_debug_explain"] = True
+        try:
+            rows = connection.exec_driver_sql(prefix + statement, parameters).fetchall()
+        except Exception as e:
+            return [f"EXPLAIN failed: {e}"]
+        finally:
+            connection.info.pop("sql_debug_explain", None)
+    return [" | ".join(str(value) for value in row) for row in rows]
+
+
+class SQLDebugger:
+    """Development/staging aid that reviews every statement of a request.
+
+    Statements slower than SQL_DEBUG_SLOW_MS get their EXPLAIN plan captured,
+    and the same statement shape issued SQL_DEBUG_REPEAT times or more in one
+    request is reported as a likely N+1 (e.g. lazy loads from a template loop).
+    Findings go to the "trackly.sql_debug" logger as JSON lines and, with
+    SQL_DEBUG_PANEL on, to a panel at the bottom of every HTML page.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get("SQL_DEBUG", False):
+            return
+        if not event.contains(Engine, "after_cursor_execute", _after_cursor_execute):
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.extensions["sql_debug"] = self
+
+    def _start_request(self):
+        g.sql_debug = []
+
+    def _finish_request(self, response):
+        statements = g.pop("sql_debug", None)
+        if statements is None:
+            return response
+
+        findings = self.analyse(statements)
+        for finding in findings:
+            logger.warning(json.dumps({"endpoint": request.endpoint, "path": request.path, **finding}))
+
+        if (
+            current_app.config.get("SQL_DEBUG_PANEL", False)
+            and response.mimetype == "text/html"
+            and not response.direct_passthrough
+            and not response.is_streamed
+        ):
+            body = response.get_data()
+            if PANEL_MARKER in body:
+                panel = render_template(
+                    "_sql_debug_panel.html", statements=statements, findings=findings
+                )
+                response.set_data(body.replace(PANEL_MARKER, panel.encode()))
+        return response
+
+    def analyse(self, statements):
+        slow_ms = current_app.config.get("SQL_DEBUG_SLOW_MS", 100)
+        repeat = current_app.config.get("SQL_DEBUG_REPEAT", 5)
+        findings = []
+
+        for item in statements:
+            if item["duration_ms"] >= slow_ms:
+                finding = {
+                    "type": "slow_query",
+                    "duration_ms": round(item["duration_ms"], 2),
+                    "statement": item["statement"],
+                }
+                if item["statement"].lstrip().upper().startswith("SELECT") and not item["executemany"]:
+                    finding["plan"] = explain(item["engine"], item["statement"], item["parameters"])
+                findings.append(finding)
+
+        shapes = Counter(" ".join(item["statement"].split()) for item in statements)
+        for shape, count in shapes.items():
+            if count >= repeat:
+                findings.append({"type": "repeated_statement", "count": count, "statement": shape})
+        return findings
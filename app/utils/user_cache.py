@@ -0,0 +1,106 @@
+from sqlalchemy.orm import Session, make_transient_to_detached
+from werkzeug.utils import import_string
+from sqlalchemy import event
+import threading
+import time
+
+
+class TTLCacheBackend:
+    """In-process cache whose entries expire `ttl` seconds after being set"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._evict_expired()
+            if len(self._entries) >= self.max_entries:
+                # Still full of live entries, drop the oldest one
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (time.monotonic() + ttl, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self._entries.items() if expires_at < now]:
+            del self._entries[key]
+
+
+class UserCache:
+    """Caches the column values of logged in users for the user_loader.
+
+    Only plain dicts are stored, so a shared backend can pickle them. Hits are
+    merged back into the request's session without a query, so routes can keep
+    modifying `current_user` and committing as usual. Invalidation only
+    reaches this process's memory backend, so other workers can serve a user
+    up to `ttl` seconds old: read anything that must be current, such as
+    data_version or shard, from the database instead.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = 60
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get("USER_CACHE_TTL", 60)
+        backend = app.config.get("USER_CACHE_BACKEND", "memory")
+        if backend == "memory":
+            self.backend = TTLCacheBackend(app.config.get("USER_CACHE_MAX_ENTRIES", 10000))
+        else:
+            # Dotted path to a shared backend with get/set(key, value, ttl)/delete
+            self.backend = import_string(backend)(app)
+        app.extensions["user_cache"] = self
+
+    def load(self, session, model, user_id):
+        data = self.backend.get(self._key(user_id))
+        if data is None:
+            user = session.get(model, user_id)
+            if user is not None:
+                self.backend.set(self._key(user_id), self._snapshot(user), self.ttl)
+            return user
+
+        user = model(**data)
+        make_transient_to_detached(user)
+        return session.merge(user, load=False)
+
+    def invalidate(self, session, user_id):
+        """Drop the user now and again once the current transaction commits"""
+        self.backend.delete(self._key(user_id))
+        session.info.setdefault("invalidated_users", set()).add((self, user_id))
+
+    def _key(self, user_id):
+        return f"user:{user_id}"
+
+    def _snapshot(self, user):
+        return {column.key: getattr(user, column.key) for column in user.__table__.columns}
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_invalidated_users(session):
+    # Deleting again after commit stops a concurrent request re-caching old values
+    for cache, user_id in session.info.pop("invalidated_users", ()):
+        cache.backend.delete(cache._key(user_id))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_invalidated_users(session):
+    session.info.pop("invalidated_users", None)
@@ -0,0 +1,257 @@
+"""Route latency and SQL-count benchmark for every blueprint.
+
+Seeds a throwaway SQLite database at each data size, logs in as a seeded user
+and drives every route through the Flask test client, reporting p50/p95/p99
+latency, throughput and SQL statements per request. With --check it exits 1
+when a route got slower (p95 beyond --tolerance), issues more queries than
+the stored baseline, or has no baseline entry to compare against. The
+committed baseline.json was taken with the defaults below; timings depend on
+the machine, so refresh it with --update-baseline where the check runs.
+
+Placeholders in urls and form data are filled per request: {expense} and
+{income} always name the same row of the logged-in user, {next_expense} and
+{next_income} a new one every time for the deletes, and {password} is the
+seeded password. POST /logout and POST /delete_account are left out: either
+one ends the session every following request depends on, and the latter
+also closes the seeded account. The GET /delete_account page is measured.
+
+    python benchmarks/routes.py --sizes 100,1000,10000 --check
+    python benchmarks/routes.py --sizes 100,1000,10000 --update-baseline
+"""
+from pathlib import Path
+import statistics
+import argparse
+import tempfile
+import json
+import time
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+sys.path.insert(0, str(ROOT))
+
+# (name, method, url, form data); urls are relative to the running app
+ROUTES = (
+    ("home.home", "GET", "/", None),
+    ("auth.login", "GET", "/login", None),
+    ("auth.register", "GET", "/register", None),
+    ("dashboard.dashboard", "GET", "/dashboard", None),
+    ("dashboard.expense_history", "GET", "/expense_history", None),
+    ("dashboard.expense_history[deep]", "GET", "/expense_history?per_page=100", None),
+    ("dashboard.expense_history[search]", "GET", "/expense_history?q=coffee", None),
+    ("dashboard.expense_history[filtered]", "GET",
+     "/expense_history?from=2024-01-01&to=2024-12-31&category=2&min_amount=100", None),
+    ("dashboard.expense_history[archived]", "GET", "/expense_history?archived=1", None),
+    ("dashboard.income_history", "GET", "/income_history", None),
+    ("dashboard.income_history[search]", "GET", "/income_history?q=salary", None),
+    ("dashboard.transactions", "GET", "/transactions", None),
+    ("dashboard.transactions[filtered]", "GET", "/transactions?from=2024-01-01&to=2024-12-31", None),
+    ("dashboard.analytics", "GET", "/analytics?months=60", None),
+    ("dashboard.analytics_data", "GET", "/analytics/data?months=60", None),
+    ("dashboard.add_expense", "GET", "/add_expense", None),
+    ("dashboard.add_expense[post]", "POST", "/add_expense", {
+        "item": "Benchmark", "category": "Others", "amount": "100", "date": "2025-06-01T12:00",
+    }),
+    ("dashboard.add_income", "GET", "/add_income", None),
+    ("dashboard.add_income[post]", "POST", "/add_income", {
+        "amount": "1000", "note": "Benchmark", "date": "2025-06-01T12:00",
+    }),
+    ("dashboard.export_data", "GET", "/export/expense.csv", None),
+    ("dashboard.import_data", "GET", "/import", None),
+    ("settings.settings", "GET", "/settings", None),
+    ("settings.avatar_status", "GET", "/settings/avatar-status", None),
+    ("settings.update_profile", "POST", "/settings/update-profile", {"name": "Bench User"}),
+    ("dashboard.update_expense", "GET", "/update_expense/{expense}", None),
+    ("dashboard.update_expense[post]", "POST", "/update_expense/{expense}", {
+        "item": "Benchmark", "category": "Food", "amount": "250", "date": "2025-06-01T12:00",
+    }),
+    ("dashboard.delete_expense", "POST", "/delete_expense/{next_expense}", None),
+    ("dashboard.update_income", "GET", "/update_income/{income}", None),
+    ("dashboard.update_income[post]", "POST", "/update_income/{income}", {
+        "amount": "2500", "note": "Benchmark", "date": "2025-06-01T12:00",
+    }),
+    ("dashboard.delete_income", "POST", "/delete_income/{next_income}", None),
+    ("settings.update_password", "POST", "/settings/update-password", {
+        "current_password": "{password}", "new_password": "{password}", "confirm_password": "{password}",
+    }),
+    ("auth.delete_account", "GET", "/delete_account", None),
+)
+# Routes that only make sense for a visitor who is not logged in
+ANONYMOUS_ROUTES = {"home.home", "auth.login", "auth.register"}
+
+
+def percentile(samples, pct):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[pct - 1]
+
+
+class Placeholders:
+    """Values for the {...} placeholders in ROUTES, see the module docstring"""
+
+    def __init__(self, password, row_ids):
+        self.password = password
+        self.row_ids = row_ids
+        self.unused = {kind: iter(ids[1:]) for kind, ids in row_ids.items()}
+
+    def __getitem__(self, key):
+        if key == "password":
+            return self.password
+        if key.startswith("next_"):
+            kind = key[len("next_"):]
+            row_id = next(self.unused[kind], None)
+            if row_id is None:
+                raise SystemExit(f"Out of {kind} rows to delete, seed more or send fewer requests")
+            return row_id
+        return self.row_ids[key][0]
+
+
+def make_app(database_path, page_cache):
+    from app import create_app, db, engine_options
+
+    database_url = f"sqlite:///{database_path}"
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": database_url,
+            "SQLALCHEMY_ENGINE_OPTIONS": engine_options(database_url),
+            "PAGE_CACHE_BACKEND": "lru" if page_cache else "null",
+            "JOB_EXECUTOR": "sync",
+            "AVATAR_STORAGE": "fake",
+        }
+    )
+    return app, db
+
+
+def run_size(rows, users, requests, page_cache):
+    from sqlalchemy import event, select
+    from app.utils.seed_utils import SEED_PASSWORD, seed_data, seed_email
+    from app.models import Expense, Income, Signup
+
+    with tempfile.TemporaryDirectory() as directory:
+        app, db = make_app(Path(directory) / "bench.sqlite", page_cache)
+        with app.app_context():
+            db.create_all()
+            seed_data(users, rows)
+            email = seed_email(1)
+            user_id = db.session.scalar(select(Signup.id).where(Signup.email == email))
+            placeholders = Placeholders(
+                SEED_PASSWORD,
+                {
+                    kind: db.session.scalars(
+                        select(model.id).where(model.user_id == user_id).order_by(model.id)
+                    ).all()
+                    for kind, model in (("expense", Expense), ("income", Income))
+                },
+            )
+
+            statements = []
+            event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(1))
+
+            results = {}
+            for logged_in in (False, True):
+                client = app.test_client()
+                if logged_in:
+                    client.post("/login", data={"email": email, "password": SEED_PASSWORD})
+                for name, method, url, data in ROUTES:
+                    if (name in ANONYMOUS_ROUTES) == logged_in:
+                        continue
+                    results[name] = measure(
+                        client, method, url, data, requests, statements, placeholders
+                    )
+            db.session.remove()
+            db.engine.dispose()
+    return results
+
+
+def measure(client, method, url, data, requests, statements, placeholders):
+    timings = []
+    queries = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        request_url = url.format_map(placeholders)
+        form = {key: value.format_map(placeholders) for key, value in (data or {}).items()}
+        before = len(statements)
+        t0 = time.perf_counter()
+        response = client.open(request_url, method=method, data=form or None)
+        response.get_data()
+        timings.append((time.perf_counter() - t0) * 1000)
+        queries.append(len(statements) - before)
+        if response.status_code >= 400:
+            raise SystemExit(f"{method} {request_url} returned {response.status_code}")
+        if method == "POST":
+            # Nothing follows the redirect, so drop the flash before it piles up
+            with client.session_transaction() as session:
+                session.pop("_flashes", None)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "p50_ms": round(percentile(timings, 50), 2),
+        "p95_ms": round(percentile(timings, 95), 2),
+        "p99_ms": round(percentile(timings, 99), 2),
+        "rps": round(requests / elapsed, 1),
+        "queries": max(queries),
+    }
+
+
+def compare(size, results, baseline, tolerance, slack_ms):
+    failures = []
+    for name, stats in results.items():
+        expected = baseline.get(str(size), {}).get(name)
+        if not expected:
+            failures.append(f"{size} rows {name}: no baseline entry, run with --update-baseline")
+            continue
+        if stats["p95_ms"] > expected["p95_ms"] * (1 + tolerance) + slack_ms:
+            failures.append(f"{size} rows {name}: p95 {stats['p95_ms']}ms > baseline {expected['p95_ms']}ms")
+        if stats["queries"] > expected["queries"]:
+            failures.append(f"{size} rows {name}: {stats['queries']} queries > baseline {expected['queries']}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,10000", help="Rows per user, comma separated.")
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=50, help="Requests per route.")
+    parser.add_argument("--page-cache", action="store_true", help="Measure with the page cache on.")
+    parser.add_argument("--check", action="store_true", help="Fail on regressions against the baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed p95 slowdown, 0.5 = 50%%.")
+    parser.add_argument(
+        "--slack-ms", type=float, default=5, help="Allowed p95 slowdown on top of --tolerance, in ms."
+    )
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    if args.check and not baseline:
+        sys.exit(f"No baseline at {BASELINE_PATH}, create one with --update-baseline")
+    failures = []
+    report = {}
+
+    for size in [int(size) for size in args.sizes.split(",")]:
+        results = run_size(size, args.users, args.requests, args.page_cache)
+        report[str(size)] = results
+
+        print(f"\n{size} rows per user")
+        print(f"{'route':<36}{'p50':>9}{'p95':>9}{'p99':>9}{'req/s':>9}{'SQL':>6}")
+        for name, stats in results.items():
+            print(
+                f"{name:<36}{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}"
+                f"{stats['rps']:>9}{stats['queries']:>6}"
+            )
+        if args.check:
+            failures += compare(size, results, baseline, args.tolerance, args.slack_ms)
+
+    if args.update_baseline:
+        baseline.update(report)
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"\nBaseline written to {BASELINE_PATH}")
+
+    if failures:
+        print("\nRegressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
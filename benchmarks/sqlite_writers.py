@@ -0,0 +1,120 @@
+"""Concurrent SQLite writers with and without the app's connection pragmas.
+
+Runs writer threads that each insert an expense and bump a running total in
+one transaction (the shape of every dashboard write) while reader threads keep
+summing the table (the shape of every page load), and reports commits and
+reads per second for each case. With the default rollback journal every commit
+waits for readers to drop their SHARED locks and then rewrites the pages
+through a journal synced on each commit; with WAL and synchronous=NORMAL the
+writer appends to the log while readers keep going, so commits/s is several
+times higher. Both cases keep the driver's default 5s busy timeout, which is
+long enough that neither normally reports "database is locked"; a non-zero
+count means a writer waited out the whole timeout.
+
+    python benchmarks/sqlite_writers.py --writers 8 --readers 4 --seconds 5
+"""
+from pathlib import Path
+import argparse
+import tempfile
+import sqlite3
+import threading
+import time
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import SQLITE_PRAGMAS  # noqa: E402
+
+SCHEMA = (
+    "CREATE TABLE expense (id INTEGER PRIMARY KEY, user_id INTEGER, amount INTEGER, date TEXT)",
+    "CREATE TABLE user_balance (user_id INTEGER PRIMARY KEY, total_expense INTEGER)",
+    "INSERT INTO user_balance VALUES (1, 0)",
+)
+
+
+def connect(path, tuned):
+    # The driver's default 5s busy timeout, which the app's engine also starts from
+    connection = sqlite3.connect(path, isolation_level=None)
+    if tuned:
+        for pragma in SQLITE_PRAGMAS:
+            connection.execute(pragma)
+    return connection
+
+
+def writer(path, tuned, stop, stats):
+    connection = connect(path, tuned)
+    while not stop.is_set():
+        try:
+            connection.execute("BEGIN")
+            connection.execute(
+                "INSERT INTO expense (user_id, amount, date) VALUES (1, 10, datetime('now'))"
+            )
+            connection.execute(
+                "UPDATE user_balance SET total_expense = total_expense + 10 WHERE user_id = 1"
+            )
+            connection.execute("COMMIT")
+            stats["commits"] += 1
+        except sqlite3.OperationalError as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            if "locked" not in str(e):
+                raise
+            stats["locked"] += 1
+    connection.close()
+
+
+def reader(path, tuned, stop, stats):
+    connection = connect(path, tuned)
+    while not stop.is_set():
+        try:
+            connection.execute("SELECT SUM(amount) FROM expense WHERE user_id = 1").fetchone()
+            stats["reads"] += 1
+        except sqlite3.OperationalError:
+            stats["locked"] += 1
+    connection.close()
+
+
+def run(tuned, writers, readers, seconds):
+    with tempfile.TemporaryDirectory() as directory:
+        path = str(Path(directory) / "bench.sqlite")
+        setup = connect(path, tuned)
+        for statement in SCHEMA:
+            setup.execute(statement)
+        setup.close()
+
+        stop = threading.Event()
+        stats = {"commits": 0, "reads": 0, "locked": 0}
+        threads = [
+            threading.Thread(target=writer, args=(path, tuned, stop, stats))
+            for _ in range(writers)
+        ] + [
+            threading.Thread(target=reader, args=(path, tuned, stop, stats))
+            for _ in range(readers)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    for label, tuned in (("default", False), ("tuned", True)):
+        stats = run(tuned, args.writers, args.readers, args.seconds)
+        print(
+            f"{label:>8}: {stats['commits'] / args.seconds:8.0f} commits/s"
+            f"  {stats['reads'] / args.seconds:8.0f} reads/s"
+            f"  {stats['locked']:6d} 'database is locked' errors"
+        )
+
+
+if __name__ == "__main__":
+    main()
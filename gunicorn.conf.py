@@ -0,0 +1,10 @@
+# gunicorn -c gunicorn.conf.py wsgi:app
+import os
+
+
+def child_exit(server, worker):
+    # Drop a dead worker's live gauges from the shared Prometheus files
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,25 @@
+"""Add signup.deleted_at for accounts closed and waiting to be purged
+
+Revision ID: a3e7c1f5b820
+Revises: f2d8a5c3e719
+Create Date: 2026-10-18 20:21:44.652093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3e7c1f5b820'
+down_revision = 'f2d8a5c3e719'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain ADD COLUMN, see f2d8a5c3e719
+    op.add_column('signup', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('signup', 'deleted_at')
@@ -0,0 +1,64 @@
+"""Add full-text search indexes over expense item/category and income note
+
+Revision ID: a6d3f0b7c952
+Revises: f5c2e8a1d304
+Create Date: 2026-10-18 16:47:05.031982
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d3f0b7c952'
+down_revision = 'f5c2e8a1d304'
+branch_labels = None
+depends_on = None
+
+SEARCHED = {
+    'expense': ('item', 'category'),
+    'income': ('note',),
+}
+
+
+def sqlite_statements(kind, cols):
+    names = ', '.join(cols)
+    new = ', '.join(f'new.{col}' for col in cols)
+    old = ', '.join(f'old.{col}' for col in cols)
+    return [
+        f"CREATE VIRTUAL TABLE {kind}_fts USING fts5({names}, content='{kind}', content_rowid='id')",
+        f"CREATE TRIGGER {kind}_fts_ai AFTER INSERT ON {kind} BEGIN"
+        f" INSERT INTO {kind}_fts(rowid, {names}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER {kind}_fts_ad AFTER DELETE ON {kind} BEGIN"
+        f" INSERT INTO {kind}_fts({kind}_fts, rowid, {names}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER {kind}_fts_au AFTER UPDATE OF {names} ON {kind} BEGIN"
+        f" INSERT INTO {kind}_fts({kind}_fts, rowid, {names}) VALUES ('delete', old.id, {old});"
+        f" INSERT INTO {kind}_fts(rowid, {names}) VALUES (new.id, {new}); END",
+        # Index the rows that already exist
+        f"INSERT INTO {kind}_fts({kind}_fts) VALUES ('rebuild')",
+    ]
+
+
+def postgres_vector(cols):
+    document = " || ' ' || ".join(f"coalesce({col}, '')" for col in cols)
+    return f"to_tsvector('simple', {document})"
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for kind, cols in SEARCHED.items():
+        if dialect == 'sqlite':
+            for statement in sqlite_statements(kind, cols):
+                op.execute(statement)
+        elif dialect == 'postgresql':
+            op.execute(f"CREATE INDEX ix_{kind}_search ON {kind} USING GIN ({postgres_vector(cols)})")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for kind in SEARCHED:
+        if dialect == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f"DROP TRIGGER IF EXISTS {kind}_fts_{suffix}")
+            op.execute(f"DROP TABLE IF EXISTS {kind}_fts")
+        elif dialect == 'postgresql':
+            op.execute(f"DROP INDEX IF EXISTS ix_{kind}_search")
@@ -0,0 +1,82 @@
+"""Never reuse expense/income ids, archived rows keep theirs
+
+Revision ID: c8e2a4f6b193
+Revises: b4f0d6e2a971
+Create Date: 2026-10-18 22:14:36.582140
+
+SQLite hands out max(id) + 1 without AUTOINCREMENT, so once the newest rows
+were deleted a new row could take an id still held by the archive. The
+tables are rebuilt with AUTOINCREMENT and their sequences start past every
+id already used, live, archived or tombstoned. Other databases' sequences
+never go back and are left alone.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e2a4f6b193'
+down_revision = 'b4f0d6e2a971'
+branch_labels = None
+depends_on = None
+
+# Search triggers as of this revision: kind -> (fields, values read from a row, columns they depend on).
+# Dropping the table drops them; the FTS tables keep their own content and are left as they are
+SEARCHED = {
+    'expense': (
+        ('item', 'category'),
+        "{row}.item, (SELECT name FROM category WHERE id = {row}.category_id)",
+        ('item', 'category_id'),
+    ),
+    'income': (('note',), "{row}.note", ('note',)),
+}
+
+
+def create_sqlite_search_triggers(kind):
+    fields, values, columns = SEARCHED[kind]
+    names = ', '.join(fields)
+    new = values.format(row='new')
+    op.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {kind}_fts_ai AFTER INSERT ON {kind} BEGIN"
+        f" INSERT INTO {kind}_fts(rowid, {names}) VALUES (new.id, {new}); END"
+    )
+    op.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {kind}_fts_ad AFTER DELETE ON {kind} BEGIN"
+        f" DELETE FROM {kind}_fts WHERE rowid = old.id; END"
+    )
+    op.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {kind}_fts_au AFTER UPDATE OF {', '.join(columns)} ON {kind} BEGIN"
+        f" DELETE FROM {kind}_fts WHERE rowid = old.id;"
+        f" INSERT INTO {kind}_fts(rowid, {names}) VALUES (new.id, {new}); END"
+    )
+
+
+def rebuild(kind, autoincrement):
+    with op.batch_alter_table(
+        kind, schema=None, recreate='always', table_kwargs={'sqlite_autoincrement': autoincrement}
+    ):
+        pass
+    create_sqlite_search_triggers(kind)
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for kind in SEARCHED:
+        rebuild(kind, autoincrement=True)
+        op.execute(f"DELETE FROM sqlite_sequence WHERE name = '{kind}'")
+        op.execute(
+            f"""
+            INSERT INTO sqlite_sequence (name, seq) SELECT '{kind}', max(
+                coalesce((SELECT max(id) FROM {kind}), 0),
+                coalesce((SELECT max(id) FROM {kind}_archive), 0),
+                coalesce((SELECT max(row_id) FROM tombstone WHERE kind = '{kind}'), 0)
+            )
+            """
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for kind in SEARCHED:
+        rebuild(kind, autoincrement=False)
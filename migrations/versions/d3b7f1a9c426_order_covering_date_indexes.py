@@ -0,0 +1,45 @@
+"""Add id to the (user_id, date) indexes so pages read in (date, id) order
+
+Revision ID: d3b7f1a9c426
+Revises: c8e2a4f6b193
+Create Date: 2026-10-19 09:41:27.663015
+
+Pages are ordered by (date, id); with amount between the two the database
+sorted every row sharing a date. amount stays last so balance sums remain
+index-only.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3b7f1a9c426'
+down_revision = 'c8e2a4f6b193'
+branch_labels = None
+depends_on = None
+
+# (table, old name, old columns, new name, new columns)
+INDEXES = (
+    ('expense', 'ix_expense_user_id_date_amount', ['user_id', 'date', 'amount'],
+     'ix_expense_user_id_date_id_amount', ['user_id', 'date', 'id', 'amount']),
+    ('income', 'ix_income_user_id_date_amount', ['user_id', 'date', 'amount'],
+     'ix_income_user_id_date_id_amount', ['user_id', 'date', 'id', 'amount']),
+    ('ledger_entry', 'ix_ledger_entry_user_id_date_amount', ['user_id', 'date', 'amount'],
+     'ix_ledger_entry_user_id_date_id_amount', ['user_id', 'date', 'id', 'amount']),
+    ('expense_archive', 'ix_expense_archive_user_id_date', ['user_id', 'date'],
+     'ix_expense_archive_user_id_date_id', ['user_id', 'date', 'id']),
+    ('income_archive', 'ix_income_archive_user_id_date', ['user_id', 'date'],
+     'ix_income_archive_user_id_date_id', ['user_id', 'date', 'id']),
+)
+
+
+def upgrade():
+    # Plain CREATE/DROP INDEX, no table copies
+    for table, old_name, _, new_name, new_columns in INDEXES:
+        op.create_index(new_name, table, new_columns, unique=False)
+        op.drop_index(old_name, table_name=table)
+
+
+def downgrade():
+    for table, old_name, old_columns, new_name, _ in INDEXES:
+        op.create_index(old_name, table, old_columns, unique=False)
+        op.drop_index(new_name, table_name=table)
@@ -0,0 +1,225 @@
+"""Drop expense.category in favour of category_id, rollups by category_id
+
+Revision ID: d7b2f4a8c613
+Revises: c1a5e7b3f902
+Create Date: 2026-10-18 18:31:47.205519
+
+Second half of the category move, to run once no code writes
+expense.category anymore. Rows written in between are caught up first.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7b2f4a8c613'
+down_revision = 'c1a5e7b3f902'
+branch_labels = None
+depends_on = None
+
+
+MONTH_EXPRESSIONS = {
+    'sqlite': "date({col}, 'start of month')",
+    'postgresql': "CAST(date_trunc('month', {col}) AS DATE)",
+    'mysql': "CAST(DATE_FORMAT({col}, '%Y-%m-01') AS DATE)",
+}
+
+# Search tables as of this revision: kind -> (fields, values read from a row, columns they depend on)
+SEARCHED = {
+    'expense': (
+        ('item', 'category'),
+        "{row}.item, (SELECT name FROM category WHERE id = {row}.category_id)",
+        ('item', 'category_id'),
+    ),
+    'income': (('note',), "{row}.note", ('note',)),
+}
+
+
+def drop_sqlite_search():
+    for kind in SEARCHED:
+        for suffix in ('ai', 'ad', 'au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {kind}_fts_{suffix}")
+        op.execute(f"DROP TABLE IF EXISTS {kind}_fts")
+
+
+def create_sqlite_search():
+    # The category name has to be copied in, so these FTS tables keep their
+    # own content instead of reading it from the ledger tables
+    for kind, (fields, values, columns) in SEARCHED.items():
+        names = ', '.join(fields)
+        new = values.format(row='new')
+        op.execute(f"CREATE VIRTUAL TABLE {kind}_fts USING fts5({names})")
+        op.execute(
+            f"CREATE TRIGGER {kind}_fts_ai AFTER INSERT ON {kind} BEGIN"
+            f" INSERT INTO {kind}_fts(rowid, {names}) VALUES (new.id, {new}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {kind}_fts_ad AFTER DELETE ON {kind} BEGIN"
+            f" DELETE FROM {kind}_fts WHERE rowid = old.id; END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {kind}_fts_au AFTER UPDATE OF {', '.join(columns)} ON {kind} BEGIN"
+            f" DELETE FROM {kind}_fts WHERE rowid = old.id;"
+            f" INSERT INTO {kind}_fts(rowid, {names}) VALUES (new.id, {new}); END"
+        )
+        op.execute(
+            f"INSERT INTO {kind}_fts(rowid, {names}) SELECT {kind}.id, {values.format(row=kind)} FROM {kind}"
+        )
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    # Catch up on expenses written by code that only knew the string column
+    op.execute(
+        """
+        INSERT INTO category (user_id, name)
+        SELECT DISTINCT e.user_id, e.category FROM expense e
+        WHERE e.category_id IS NULL AND NOT EXISTS (
+            SELECT 1 FROM category c WHERE c.user_id = e.user_id AND c.name = e.category
+        )
+        """
+    )
+    op.execute(
+        """
+        UPDATE expense SET category_id = (
+            SELECT category.id FROM category
+            WHERE category.user_id = expense.user_id AND category.name = expense.category
+        )
+        WHERE category_id IS NULL
+        """
+    )
+
+    # Search indexes read expense.category, rebuilt below
+    if dialect == 'sqlite':
+        drop_sqlite_search()
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_expense_search")
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_index('ix_expense_user_id_category_date', table_name='expense')
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.alter_column('category_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key('fk_expense_category_id_category', 'category', ['category_id'], ['id'])
+        batch_op.drop_column('category')
+
+    op.drop_table('monthly_rollup')
+    op.create_table('monthly_rollup',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.BigInteger(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['signup.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'kind', 'month', 'category_id')
+    )
+    # ### end Alembic commands ###
+
+    # Rollups are derived data, regrouped here on the integer ids
+    month = MONTH_EXPRESSIONS[dialect]
+    op.execute(
+        f"""
+        INSERT INTO monthly_rollup (user_id, kind, month, category_id, total, count)
+        SELECT user_id, 'expense', {month.format(col='date')}, category_id, SUM(amount), COUNT(*)
+        FROM expense WHERE date IS NOT NULL
+        GROUP BY user_id, {month.format(col='date')}, category_id
+        """
+    )
+    op.execute(
+        f"""
+        INSERT INTO monthly_rollup (user_id, kind, month, category_id, total, count)
+        SELECT user_id, 'income', {month.format(col='date')}, 0, SUM(amount), COUNT(*)
+        FROM income WHERE date IS NOT NULL
+        GROUP BY user_id, {month.format(col='date')}
+        """
+    )
+
+    if dialect == 'sqlite':
+        create_sqlite_search()
+    elif dialect == 'postgresql':
+        op.execute("CREATE INDEX ix_expense_search ON expense USING GIN (to_tsvector('simple', coalesce(item, '')))")
+        op.execute("CREATE INDEX ix_category_search ON category USING GIN (to_tsvector('simple', coalesce(name, '')))")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        drop_sqlite_search()
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_category_search")
+        op.execute("DROP INDEX IF EXISTS ix_expense_search")
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('category', sa.String(length=100), nullable=True))
+    # ### end Alembic commands ###
+
+    op.execute(
+        "UPDATE expense SET category = (SELECT name FROM category WHERE category.id = expense.category_id)"
+    )
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.alter_column('category', existing_type=sa.String(length=100), nullable=False)
+        batch_op.drop_constraint('fk_expense_category_id_category', type_='foreignkey')
+        batch_op.alter_column('category_id', existing_type=sa.Integer(), nullable=True)
+    op.create_index('ix_expense_user_id_category_date', 'expense', ['user_id', 'category', 'date'], unique=False)
+
+    op.drop_table('monthly_rollup')
+    op.create_table('monthly_rollup',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('category', sa.String(length=100), nullable=False),
+    sa.Column('total', sa.BigInteger(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['signup.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'kind', 'month', 'category')
+    )
+    # ### end Alembic commands ###
+
+    month = MONTH_EXPRESSIONS[dialect]
+    op.execute(
+        f"""
+        INSERT INTO monthly_rollup (user_id, kind, month, category, total, count)
+        SELECT user_id, 'expense', {month.format(col='date')}, category, SUM(amount), COUNT(*)
+        FROM expense WHERE date IS NOT NULL
+        GROUP BY user_id, {month.format(col='date')}, category
+        """
+    )
+    op.execute(
+        f"""
+        INSERT INTO monthly_rollup (user_id, kind, month, category, total, count)
+        SELECT user_id, 'income', {month.format(col='date')}, '', SUM(amount), COUNT(*)
+        FROM income WHERE date IS NOT NULL
+        GROUP BY user_id, {month.format(col='date')}
+        """
+    )
+
+    # Search as of a6d3f0b7c952
+    if dialect == 'sqlite':
+        for kind, cols in (('expense', ('item', 'category')), ('income', ('note',))):
+            names = ', '.join(cols)
+            new = ', '.join(f'new.{col}' for col in cols)
+            old = ', '.join(f'old.{col}' for col in cols)
+            op.execute(f"CREATE VIRTUAL TABLE {kind}_fts USING fts5({names}, content='{kind}', content_rowid='id')")
+            op.execute(
+                f"CREATE TRIGGER {kind}_fts_ai AFTER INSERT ON {kind} BEGIN"
+                f" INSERT INTO {kind}_fts(rowid, {names}) VALUES (new.id, {new}); END"
+            )
+            op.execute(
+                f"CREATE TRIGGER {kind}_fts_ad AFTER DELETE ON {kind} BEGIN"
+                f" INSERT INTO {kind}_fts({kind}_fts, rowid, {names}) VALUES ('delete', old.id, {old}); END"
+            )
+            op.execute(
+                f"CREATE TRIGGER {kind}_fts_au AFTER UPDATE OF {names} ON {kind} BEGIN"
+                f" INSERT INTO {kind}_fts({kind}_fts, rowid, {names}) VALUES ('delete', old.id, {old});"
+                f" INSERT INTO {kind}_fts(rowid, {names}) VALUES (new.id, {new}); END"
+            )
+            op.execute(f"INSERT INTO {kind}_fts({kind}_fts) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        op.execute(
+            "CREATE INDEX ix_expense_search ON expense USING GIN"
+            " (to_tsvector('simple', coalesce(item, '') || ' ' || coalesce(category, '')))"
+        )
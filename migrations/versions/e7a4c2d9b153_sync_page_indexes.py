@@ -0,0 +1,44 @@
+"""Index (user_id, change_seq, id) so sync pages read in (change_seq, id) order
+
+Revision ID: e7a4c2d9b153
+Revises: d3b7f1a9c426
+Create Date: 2026-10-19 14:08:52.310846
+
+Sync snapshots now page through live and archived rows by (change_seq, id);
+the archive tables had no change_seq index at all.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a4c2d9b153'
+down_revision = 'd3b7f1a9c426'
+branch_labels = None
+depends_on = None
+
+# (table, old name and columns or None, new name, new columns)
+INDEXES = (
+    ('expense', ('ix_expense_user_id_change_seq', ['user_id', 'change_seq']),
+     'ix_expense_user_id_change_seq_id', ['user_id', 'change_seq', 'id']),
+    ('income', ('ix_income_user_id_change_seq', ['user_id', 'change_seq']),
+     'ix_income_user_id_change_seq_id', ['user_id', 'change_seq', 'id']),
+    ('expense_archive', None,
+     'ix_expense_archive_user_id_change_seq_id', ['user_id', 'change_seq', 'id']),
+    ('income_archive', None,
+     'ix_income_archive_user_id_change_seq_id', ['user_id', 'change_seq', 'id']),
+)
+
+
+def upgrade():
+    # Plain CREATE/DROP INDEX, no table copies
+    for table, old, new_name, new_columns in INDEXES:
+        op.create_index(new_name, table, new_columns, unique=False)
+        if old:
+            op.drop_index(old[0], table_name=table)
+
+
+def downgrade():
+    for table, old, new_name, _ in INDEXES:
+        if old:
+            op.create_index(old[0], table, old[1], unique=False)
+        op.drop_index(new_name, table_name=table)
@@ -0,0 +1,28 @@
+"""Add signup.shard, the directory of which database holds each user's rows
+
+Revision ID: f2d8a5c3e719
+Revises: e4c9b1d6a257
+Create Date: 2026-10-18 19:48:02.117384
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2d8a5c3e719'
+down_revision = 'e4c9b1d6a257'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain ADD COLUMN: a batch copy of signup would cascade-delete every
+    # user's rows on SQLite when it drops the old table
+    op.add_column('signup', sa.Column('shard', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_signup_shard', 'signup', ['shard'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_signup_shard', table_name='signup')
+    op.drop_column('signup', 'shard')
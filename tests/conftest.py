@@ -0,0 +1,40 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import create_app, db, engine_options  # noqa: E402
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build apps on a fresh schema, a temporary SQLite file unless a url is given"""
+    apps = []
+
+    def make(database_url=None, **config):
+        database_url = database_url or f"sqlite:///{tmp_path / 'test.sqlite'}"
+        app = create_app(
+            {
+                "TESTING": True,
+                "SQLALCHEMY_DATABASE_URI": database_url,
+                "SQLALCHEMY_ENGINE_OPTIONS": engine_options(database_url),
+                "PAGE_CACHE_BACKEND": "null",
+                "JOB_EXECUTOR": "sync",
+                "AVATAR_STORAGE": "fake",
+                **config,
+            }
+        )
+        with app.app_context():
+            db.create_all()
+        apps.append(app)
+        return app
+
+    yield make
+
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+            db.engine.dispose()
@@ -0,0 +1,71 @@
+from app.utils.archive_utils import archive_user
+from app.utils.seed_utils import SEED_PASSWORD, seed_data, seed_email
+from app.models import Expense, ExpenseArchive, Income, IncomeArchive
+from app.routes import api
+from datetime import datetime
+from app import db
+import pytest
+
+
+@pytest.fixture
+def app(make_app, monkeypatch):
+    monkeypatch.setattr(api, "SYNC_PAGE_SIZE", 7)
+    app = make_app()
+    with app.app_context():
+        seed_data(users=1, rows=30)
+        db.session.commit()
+        assert archive_user(1, datetime(2023, 1, 1)) > 0
+    return app
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post("/login", data={"email": seed_email(1), "password": SEED_PASSWORD})
+    return client
+
+
+def ids(app, *models):
+    with app.app_context():
+        return sorted(row.id for model in models for row in model.query.filter_by(user_id=1))
+
+
+def sync_pages(client, **args):
+    """Follow `next` to the end, returning every page"""
+    pages = [client.get("/api/sync", query_string=args).get_json()]
+    while pages[-1]["next"]:
+        pages.append(client.get("/api/sync", query_string={"page": pages[-1]["next"]}).get_json())
+    return pages
+
+
+def test_snapshot_pages_cover_live_and_archived_rows_once(app, client):
+    pages = sync_pages(client)
+
+    assert len(pages) > 1
+    assert all(len(page["expenses"]) <= 7 and len(page["incomes"]) <= 7 for page in pages)
+    assert len({page["cursor"] for page in pages}) == 1
+    expenses = [row["id"] for page in pages for row in page["expenses"]]
+    incomes = [row["id"] for page in pages for row in page["incomes"]]
+    assert sorted(expenses) == ids(app, Expense, ExpenseArchive)
+    assert sorted(incomes) == ids(app, Income, IncomeArchive)
+
+
+def test_delete_during_a_snapshot_comes_with_the_next_sync(app, client):
+    first = client.get("/api/sync").get_json()
+    sent = {row["id"] for row in first["expenses"]}
+    deleted = max(set(ids(app, Expense)) - sent)
+    response = client.post(
+        "/api/expenses/batch", json={"operations": [{"op": "delete", "id": deleted}]}
+    )
+    assert response.status_code == 200
+
+    rest = [first] + sync_pages(client, page=first["next"])
+    assert deleted not in {row["id"] for page in rest for row in page["expenses"]}
+
+    changes = client.get("/api/sync", query_string={"since": first["cursor"]}).get_json()
+    assert changes["deleted"]["expenses"] == [deleted]
+    assert changes["next"] is None
+
+
+def test_malformed_page_is_refused(client):
+    assert client.get("/api/sync", query_string={"page": "not-a-page"}).status_code == 400
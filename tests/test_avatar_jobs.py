@@ -0,0 +1,114 @@
+from app.utils.avatar_storage import LocalStorage, get_storage
+from app.utils.seed_utils import SEED_PASSWORD, seed_data, seed_email
+from app.models import Signup
+from app import db
+from PIL import Image
+import pytest
+import io
+
+
+def png(color):
+    output = io.BytesIO()
+    Image.new("RGB", (400, 300), color).save(output, "PNG")
+    return output.getvalue()
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(JOB_MAX_RETRIES=0, JOB_RETRY_DELAY=0)
+    with app.app_context():
+        seed_data(users=1, rows=0)
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post("/login", data={"email": seed_email(1), "password": SEED_PASSWORD})
+    return client
+
+
+def upload(client, data):
+    return client.post(
+        "/settings/upload-profile-picture",
+        data={"profile_picture": (io.BytesIO(data), "avatar.png")},
+        content_type="multipart/form-data",
+    )
+
+
+def stored_user(app):
+    with app.app_context():
+        return db.session.get(Signup, 1)
+
+
+def test_upload_becomes_ready(app, client):
+    assert upload(client, png("red")).status_code == 302
+
+    user = stored_user(app)
+    assert user.avatar_status == "ready"
+    with app.app_context():
+        files = get_storage().files
+    assert list(files) == [user.profile_picture_url]
+    assert client.get("/settings/avatar-status").get_json() == {
+        "status": "ready",
+        "url": user.profile_picture_url,
+    }
+
+
+def test_upload_failure_is_recorded(app, client, monkeypatch):
+    with app.app_context():
+        storage = get_storage()
+
+    def unavailable(data, extension):
+        raise ConnectionError("storage is down")
+
+    monkeypatch.setattr(storage, "put", unavailable)
+    upload(client, png("red"))
+
+    user = stored_user(app)
+    assert user.avatar_status == "failed"
+    assert user.profile_picture_url is None
+    assert client.get("/settings/avatar-status").get_json()["status"] == "failed"
+
+
+def test_new_upload_destroys_the_old_avatar(app, client):
+    upload(client, png("red"))
+    old_url = stored_user(app).profile_picture_url
+    upload(client, png("blue"))
+
+    new_url = stored_user(app).profile_picture_url
+    assert new_url != old_url
+    with app.app_context():
+        assert list(get_storage().files) == [new_url]
+
+
+def test_same_image_again_keeps_the_avatar(app, client):
+    upload(client, png("red"))
+    upload(client, png("red"))
+
+    url = stored_user(app).profile_picture_url
+    with app.app_context():
+        assert list(get_storage().files) == [url]
+
+
+def test_same_image_is_stored_once_per_upload(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    first = storage.put(b"avatar", ".webp")
+    second = storage.put(b"avatar", ".webp")
+    assert first != second
+
+    # Another user with the same picture removing theirs leaves this one alone
+    storage.destroy(first)
+    assert [path.name for path in tmp_path.iterdir()] == [second.rsplit("/", 1)[1]]
+
+
+def test_remove_destroys_the_avatar(app, client):
+    upload(client, png("red"))
+    client.post("/settings/remove-profile-picture")
+
+    user = stored_user(app)
+    assert user.profile_picture_url is None
+    assert user.avatar_status is None
+    with app.app_context():
+        assert get_storage().files == {}
@@ -0,0 +1,19 @@
+import pytest
+
+pytest.importorskip("prometheus_client")
+
+
+def test_metrics_are_hidden_without_a_token(make_app):
+    client = make_app(METRICS_ENABLED=True, METRICS_TOKEN=None).test_client()
+    assert client.get("/metrics").status_code == 404
+    assert client.get("/metrics", headers={"Authorization": "Bearer "}).status_code == 404
+
+
+def test_metrics_need_the_token(make_app):
+    client = make_app(METRICS_ENABLED=True, METRICS_TOKEN="secret").test_client()
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 403
+
+    response = client.get("/metrics", headers={"Authorization": "Bearer secret"})
+    assert response.status_code == 200
+    assert b"trackly_request_latency_seconds" in response.data
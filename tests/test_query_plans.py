@@ -0,0 +1,37 @@
+from app.commands import explain, hot_queries, plan_problems
+from app.utils.seed_utils import seed_data
+from app import db
+import pytest
+import os
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def database_url(request, tmp_path):
+    if request.param == "sqlite":
+        return f"sqlite:///{tmp_path / 'plans.sqlite'}"
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    return url
+
+
+def test_hot_queries_use_indexes(make_app, database_url):
+    app = make_app(database_url)
+    with app.app_context():
+        seed_data(users=2, rows=300)
+        db.session.commit()
+        dialect_name = db.engine.dialect.name
+        if dialect_name == "postgresql":
+            # Fresh tables have no statistics, the planner would guess
+            db.session.execute(db.text("ANALYZE"))
+            db.session.commit()
+
+        failures = {}
+        for name, statement, ordered in hot_queries():
+            plan = explain(statement)
+            if plan_problems(plan, dialect_name, ordered):
+                failures[name] = plan
+
+    assert not failures, "\n".join(
+        f"{name}:\n    " + "\n    ".join(plan) for name, plan in failures.items()
+    )
@@ -0,0 +1,60 @@
+from app.utils.seed_utils import SEED_PASSWORD, seed_data, seed_email
+from app.models import Expense
+from app import db, shards, user_cache
+import pytest
+
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    app = make_app(SQLALCHEMY_SHARD_URLS=[f"sqlite:///{tmp_path / 'shard1.sqlite'}"])
+    with app.app_context():
+        db.metadata.create_all(shards.engine(1))
+        seed_data(users=1, rows=20)
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post("/login", data={"email": seed_email(1), "password": SEED_PASSWORD})
+    return client
+
+
+def move_elsewhere(app, monkeypatch):
+    """Move user 1 to shard 1 the way another process would, leaving this one's cache as it was"""
+    with app.app_context(), monkeypatch.context() as patch:
+        patch.setattr(user_cache, "invalidate", lambda session, user_id: None)
+        assert shards.move_user(1, 1, grace=0)
+
+
+def test_cached_user_follows_a_move(app, client, monkeypatch):
+    totals = client.get("/api/totals").get_json()
+    assert totals["expense_count"] == 20
+    move_elsewhere(app, monkeypatch)
+
+    assert client.get("/api/totals").get_json() == totals
+    assert len(client.get("/api/expenses").get_json()["items"]) == 20
+    response = client.post(
+        "/add_expense",
+        data={"item": "Tea", "category": "Food", "amount": "50", "date": "2025-06-01T12:00"},
+    )
+    assert response.status_code == 302
+    with app.app_context():
+        with shards.engine(1).connect() as connection:
+            assert connection.scalar(db.select(db.func.count()).select_from(Expense)) == 21
+        with shards.engine(0).connect() as connection:
+            assert connection.scalar(db.select(db.func.count()).select_from(Expense)) == 0
+
+
+def test_write_routed_to_the_old_shard_asks_for_a_retry(app, client, monkeypatch):
+    move_elsewhere(app, monkeypatch)
+    monkeypatch.setattr(shards, "use_user", lambda user_id: shards.use(0))
+
+    operation = {"op": "create", "item": "Tea", "category": "Food", "amount": 50, "date": "2025-06-01T12:00"}
+    response = client.post("/api/expenses/batch", json={"operations": [operation]})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert "error" in response.get_json()
+    with app.app_context(), shards.engine(0).connect() as connection:
+        assert connection.scalar(db.select(db.func.count()).select_from(Expense)) == 0